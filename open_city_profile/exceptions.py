@@ -27,6 +27,10 @@ class CannotPerformThisActionWithGivenServiceType(ProfileGraphQLError):
     """Incorrect service type for given action"""
 
 
+class InvalidCursorError(ProfileGraphQLError):
+    """The given pagination cursor is invalid"""
+
+
 class InvalidEmailFormatError(ProfileGraphQLError):
     """Email must be in valid email format"""
 
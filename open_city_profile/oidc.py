@@ -1,7 +1,180 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from helusers.authz import UserAuthorization
 from helusers.oidc import ApiTokenAuthentication
+from jwkest.jwk import KEYS
+from oidc_auth.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """
+    Bounded cache of the claims and the user id of the verified API tokens.
+
+    The entries are keyed by a hash of the token, so that the tokens themselves are not
+    kept in memory, and they expire when the token would no longer pass the validation.
+    When the cache is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def get_key(token):
+        return hashlib.sha256(token).hexdigest()
+
+    def get(self, key):
+        """Returns the (claims, user id) of the token hash, or None if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, user_id, expires_at = entry
+            if time.time() > expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return dict(claims), user_id
+
+    def set(self, key, claims, user_id):
+        max_size = settings.OIDC_TOKEN_CACHE_SIZE
+        if max_size <= 0:
+            return
+        # validate_claims() rejects tokens past their exp or issued longer than the
+        # leeway ago
+        expires_at = min(
+            claims.get("exp", 0), claims.get("iat", 0) + api_settings.OIDC_LEEWAY
+        )
+        with self._lock:
+            self._entries[key] = (dict(claims), user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class KeyCache:
+    """
+    Cache of the signing keys (JWKS) of the token issuers.
+
+    Keys older than OIDC_JWKS_REFRESH_INTERVAL are still used while a background thread
+    fetches them again, so that requests don't wait for the issuer. Only when there are
+    no keys, or the keys are older than OIDC_JWKS_CACHE_TIMEOUT because the refreshes
+    have failed, are they fetched on the request thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # issuer -> (keys, fetched_at)
+        self._keys = {}
+        # issuer -> running refresh thread
+        self._refreshing = {}
+
+    def get(self, issuer, fetch):
+        with self._lock:
+            entry = self._keys.get(issuer)
+        if entry is None:
+            return self._fetch(issuer, fetch)
+        keys, fetched_at = entry
+        age = time.monotonic() - fetched_at
+        if age >= settings.OIDC_JWKS_CACHE_TIMEOUT:
+            return self._fetch(issuer, fetch)
+        if age >= settings.OIDC_JWKS_REFRESH_INTERVAL:
+            self._refresh_in_background(issuer, fetch)
+        return keys
+
+    def _fetch(self, issuer, fetch):
+        keys = fetch()
+        with self._lock:
+            self._keys[issuer] = (keys, time.monotonic())
+        return keys
+
+    def _refresh(self, issuer, fetch):
+        try:
+            self._fetch(issuer, fetch)
+        except Exception:
+            logger.exception("Refreshing the signing keys of %s failed", issuer)
+        finally:
+            with self._lock:
+                self._refreshing.pop(issuer, None)
+
+    def _refresh_in_background(self, issuer, fetch):
+        with self._lock:
+            if issuer in self._refreshing:
+                return
+            thread = threading.Thread(
+                target=self._refresh,
+                args=(issuer, fetch),
+                name="jwks-refresh",
+                daemon=True,
+            )
+            self._refreshing[issuer] = thread
+        thread.start()
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+token_cache = TokenCache()
+key_cache = KeyCache()
+
+
+class CachedApiTokenAuthentication(ApiTokenAuthentication):
+    """
+    helusers.oidc.ApiTokenAuthentication which verifies each API token only once.
+
+    The claims and the user of a verified token are kept in token_cache until the token
+    expires, so the repeated requests with the same token skip the signature verification
+    and the user update, and only load the user by its id. The signing keys are kept in
+    key_cache.
+    """
+
+    def jwks(self):
+        return key_cache.get(self.settings.ISSUER, self._fetch_jwks)
+
+    def _fetch_jwks(self):
+        keys = KEYS()
+        keys.load_from_url(self.oidc_config["jwks_uri"])
+        return keys
+
+    def _authenticate_cached(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            return None
+        claims, user_id = cached
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        return user, UserAuthorization(user, claims, self.settings)
+
+    def authenticate(self, request):
+        jwt_value = self.get_jwt_value(request)
+        if jwt_value is None:
+            return None
+
+        key = token_cache.get_key(jwt_value)
+        user_auth_tuple = self._authenticate_cached(key)
+        if user_auth_tuple is None:
+            user_auth_tuple = super().authenticate(request)
+            if user_auth_tuple:
+                user, auth = user_auth_tuple
+                token_cache.set(key, auth.data, user.pk)
+        return user_auth_tuple
 
 
-class GraphQLApiTokenAuthentication(ApiTokenAuthentication):
+class GraphQLApiTokenAuthentication(CachedApiTokenAuthentication):
     """
     Custom wrapper for the helusers.oidc.ApiTokenAuthentication backend.
     Needed to make it work with graphql_jwt.middleware.JSONWebTokenMiddleware,
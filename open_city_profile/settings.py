@@ -1,6 +1,5 @@
 import os
 import subprocess
-from sys import stdout
 
 import environ
 import sentry_sdk
@@ -46,7 +45,25 @@ env = environ.Env(
     VERSION=(str, None),
     AUDIT_LOGGING_ENABLED=(bool, False),
     AUDIT_LOG_USERNAME=(bool, False),
+    AUDIT_LOG_SINK=(str, "stdout"),
+    AUDIT_LOG_FILENAME=(str, ""),
+    AUDIT_LOG_QUEUE_SIZE=(int, 10000),
+    AUDIT_LOG_METRICS_INTERVAL=(int, 60),
     GDPR_API_ENABLED=(bool, False),
+    GDPR_API_DEADLINE=(float, 10),
+    GDPR_API_MAX_WORKERS=(int, 10),
+    GDPR_API_POOL_SIZE=(int, 10),
+    GDPR_API_MAX_RETRIES=(int, 2),
+    GDPR_API_RETRY_BACKOFF=(float, 0.3),
+    PROFILE_IMPORT_CHUNK_SIZE=(int, 1000),
+    PROFILE_IMPORT_STALE_TIMEOUT=(int, 15 * 60),
+    PROFILE_COUNT_MODE=(str, "exact"),
+    PROFILE_COUNT_ESTIMATE_THRESHOLD=(int, 10000),
+    PROFILE_COUNT_CACHE_TIMEOUT=(int, 0),
+    SERVICE_REGISTRY_TIMEOUT=(int, 60),
+    OIDC_TOKEN_CACHE_SIZE=(int, 10000),
+    OIDC_JWKS_REFRESH_INTERVAL=(int, 60 * 60),
+    OIDC_JWKS_CACHE_TIMEOUT=(int, 24 * 60 * 60),
     ENABLE_GRAPHIQL=(bool, False),
     FORCE_SCRIPT_NAME=(str, ""),
     CSRF_COOKIE_NAME=(str, ""),
@@ -119,6 +136,8 @@ vars().update(env.email_url())  # EMAIL_BACKEND etc.
 
 var_root = env.path("VAR_ROOT")
 MEDIA_ROOT = var_root("media")
+# Uploaded profile import files are kept outside of the public MEDIA_ROOT
+PROFILE_IMPORT_ROOT = var_root("profile_imports")
 STATIC_ROOT = var_root("static")
 MEDIA_URL = env.str("MEDIA_URL")
 STATIC_URL = env.str("STATIC_URL")
@@ -151,6 +170,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.gis",
+    "django.contrib.postgres",
     "allauth",
     "allauth.account",
     "allauth.socialaccount",
@@ -235,6 +255,13 @@ OIDC_API_TOKEN_AUTH = {
 
 OIDC_AUTH = {"OIDC_LEEWAY": 60 * 60}
 
+# Number of verified API tokens whose claims and user are cached in each process, 0 disables
+OIDC_TOKEN_CACHE_SIZE = env.int("OIDC_TOKEN_CACHE_SIZE")
+# Seconds after which the signing keys of the token issuer are refreshed in the background
+OIDC_JWKS_REFRESH_INTERVAL = env.int("OIDC_JWKS_REFRESH_INTERVAL")
+# Seconds after which the signing keys are no longer used if the refreshes have failed
+OIDC_JWKS_CACHE_TIMEOUT = env.int("OIDC_JWKS_CACHE_TIMEOUT")
+
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
     "open_city_profile.oidc.GraphQLApiTokenAuthentication",
@@ -321,9 +348,48 @@ LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "handlers": {
-        "audit": {"level": "INFO", "class": "logging.StreamHandler", "stream": stdout}
+        "audit": {
+            "level": "INFO",
+            "()": "profiles.audit_log.QueuedAuditLogHandler",
+            "sink": env.str("AUDIT_LOG_SINK"),
+            "filename": env.str("AUDIT_LOG_FILENAME") or None,
+            "queue_size": env.int("AUDIT_LOG_QUEUE_SIZE"),
+            # Seconds between the queue depth and counter log lines, 0 disables them
+            "metrics_interval": env.int("AUDIT_LOG_METRICS_INTERVAL"),
+        },
+        "console": {"level": "INFO", "class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "audit": {"handlers": ["audit"], "level": "INFO", "propagate": True},
+        "profiles.audit_log": {"handlers": ["console"], "level": "INFO"},
     },
-    "loggers": {"audit": {"handlers": ["audit"], "level": "INFO", "propagate": True}},
 }
 
 GDPR_API_ENABLED = env.bool("GDPR_API_ENABLED")
+# Overall time limit in seconds for calling the GDPR APIs of the connected services
+GDPR_API_DEADLINE = env.float("GDPR_API_DEADLINE")
+# Maximum number of connected services called concurrently
+GDPR_API_MAX_WORKERS = env.int("GDPR_API_MAX_WORKERS")
+# Maximum number of kept alive connections per connected service host
+GDPR_API_POOL_SIZE = env.int("GDPR_API_POOL_SIZE")
+# Retries of GDPR API requests failing with a connection error or a 502, 503 or 504 status
+GDPR_API_MAX_RETRIES = env.int("GDPR_API_MAX_RETRIES")
+GDPR_API_RETRY_BACKOFF = env.float("GDPR_API_RETRY_BACKOFF")
+
+# Number of customers saved in a single transaction by the profile import jobs
+PROFILE_IMPORT_CHUNK_SIZE = env.int("PROFILE_IMPORT_CHUNK_SIZE")
+# Seconds after which an import job without saved progress is considered interrupted and can
+# be resumed. Has to be longer than importing a single chunk takes.
+PROFILE_IMPORT_STALE_TIMEOUT = env.int("PROFILE_IMPORT_STALE_TIMEOUT")
+
+# How the counts of the profiles query are computed: "exact", "estimate" for the planner
+# estimate, or "auto" for the estimate when it is above PROFILE_COUNT_ESTIMATE_THRESHOLD
+PROFILE_COUNT_MODE = env.str("PROFILE_COUNT_MODE")
+PROFILE_COUNT_ESTIMATE_THRESHOLD = env.int("PROFILE_COUNT_ESTIMATE_THRESHOLD")
+# Seconds the counts of the profiles query are cached, 0 disables caching
+PROFILE_COUNT_CACHE_TIMEOUT = env.int("PROFILE_COUNT_CACHE_TIMEOUT")
+
+# Seconds the services are kept in memory by each process. Changes are seen immediately by
+# the processes sharing the cache with the process which made them, and by the others only
+# after this timeout, e.g. with the default process local cache.
+SERVICE_REGISTRY_TIMEOUT = env.int("SERVICE_REGISTRY_TIMEOUT")
@@ -10,6 +10,7 @@ from open_city_profile.tests.factories import (
     UserFactory,
 )
 from open_city_profile.views import GraphQLView
+from services.registry import invalidate_services
 
 
 @pytest.fixture(autouse=True)
@@ -22,6 +23,12 @@ def set_random_seed():
     factory.random.reseed_random(666)
 
 
+@pytest.fixture(autouse=True)
+def clear_service_registry():
+    # the services of the earlier tests are rolled back without sending signals
+    invalidate_services()
+
+
 @pytest.fixture(autouse=True)
 def email_setup(settings):
     settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+
+import pytest
+from Cryptodome.PublicKey import RSA
+from helusers.settings import api_token_auth_settings
+from jwkest.jwk import RSAKey
+from jwkest.jws import JWS
+from rest_framework.exceptions import AuthenticationFailed
+
+from open_city_profile.oidc import (
+    GraphQLApiTokenAuthentication,
+    key_cache,
+    KeyCache,
+    token_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_oidc_caches():
+    token_cache.clear()
+    key_cache.clear()
+
+
+@pytest.fixture
+def token_payload(user):
+    now = int(time.time())
+    return {
+        "iss": "https://issuer.example.com",
+        "aud": ["profile-api"],
+        "sub": str(user.uuid),
+        "iat": now,
+        "exp": now + 300,
+    }
+
+
+@pytest.fixture
+def issuer(mocker, requests_mock):
+    """Serves the OpenID configuration and the signing keys of a local issuer
+
+    Returns the function which sets the signing keys served by the issuer. The tokens are
+    decoded and validated with the real helusers and drf-oidc-auth code.
+    """
+    issuer_url = "https://issuer.example.com"
+    for name, value in (
+        ("ISSUER", issuer_url),
+        ("AUDIENCE", "profile-api"),
+        ("REQUIRE_API_SCOPE_FOR_AUTHENTICATION", False),
+    ):
+        mocker.patch.object(api_token_auth_settings, name, value)
+    requests_mock.get(
+        issuer_url + "/.well-known/openid-configuration",
+        json={"issuer": issuer_url, "jwks_uri": issuer_url + "/jwks"},
+    )
+
+    def set_keys(*keys):
+        return requests_mock.get(
+            issuer_url + "/jwks",
+            json={"keys": [key.serialize(private=False) for key in keys]},
+        )
+
+    return set_keys
+
+
+def _create_key(kid):
+    return RSAKey(key=RSA.generate(2048), kid=kid)
+
+
+def _sign(payload, key):
+    return JWS(json.dumps(payload), alg="RS256").sign_compact(keys=[key])
+
+
+@pytest.fixture
+def decode_jwt(mocker, token_payload):
+    mocker.patch.object(GraphQLApiTokenAuthentication, "validate_claims")
+    return mocker.patch.object(
+        GraphQLApiTokenAuthentication, "decode_jwt", return_value=token_payload
+    )
+
+
+def _authenticate(rf, token):
+    request = rf.get("/", HTTP_AUTHORIZATION="Bearer " + token)
+    return GraphQLApiTokenAuthentication().authenticate(request)
+
+
+def test_api_token_is_verified_only_once(rf, user, decode_jwt):
+    assert _authenticate(rf, "token") == user
+    assert _authenticate(rf, "token") == user
+    assert decode_jwt.call_count == 1
+
+    assert _authenticate(rf, "another-token") == user
+    assert decode_jwt.call_count == 2
+
+
+def test_expired_api_token_is_verified_again(rf, user, decode_jwt, token_payload):
+    token_payload["exp"] = int(time.time()) - 1
+
+    _authenticate(rf, "token")
+    _authenticate(rf, "token")
+
+    assert decode_jwt.call_count == 2
+
+
+def test_api_token_cache_is_bounded(rf, user, decode_jwt, settings):
+    settings.OIDC_TOKEN_CACHE_SIZE = 1
+
+    _authenticate(rf, "token")
+    _authenticate(rf, "another-token")
+    _authenticate(rf, "token")
+
+    assert decode_jwt.call_count == 3
+
+
+def test_signing_keys_are_refreshed_in_the_background(settings):
+    cache = KeyCache()
+    fetched = threading.Event()
+    keys = iter(["old keys", "new keys"])
+
+    def fetch():
+        fetched.wait(timeout=5)
+        return next(keys)
+
+    fetched.set()
+    assert cache.get("issuer", fetch) == "old keys"
+
+    settings.OIDC_JWKS_REFRESH_INTERVAL = 0
+    fetched.clear()
+    assert cache.get("issuer", fetch) == "old keys"
+    refresh = cache._refreshing["issuer"]
+    fetched.set()
+    refresh.join(timeout=5)
+
+    settings.OIDC_JWKS_REFRESH_INTERVAL = 60
+    assert cache.get("issuer", fetch) == "new keys"
+
+
+def test_api_token_signed_by_the_issuer_is_accepted(rf, user, issuer, token_payload):
+    key = _create_key("key-1")
+    jwks = issuer(key)
+
+    assert _authenticate(rf, _sign(token_payload, key)) == user
+    assert jwks.call_count == 1
+
+    with pytest.raises(AuthenticationFailed):
+        _authenticate(rf, _sign(token_payload, _create_key("key-1")))
+    token_payload["aud"] = ["another-api"]
+    with pytest.raises(AuthenticationFailed):
+        _authenticate(rf, _sign(token_payload, key))
+
+
+def test_api_token_signed_by_a_rotated_key_is_accepted_after_a_refresh(
+    rf, user, issuer, token_payload, settings
+):
+    old_key = _create_key("key-1")
+    new_key = _create_key("key-2")
+    issuer(old_key)
+    assert _authenticate(rf, _sign(token_payload, old_key)) == user
+
+    # the issuer publishes the new key next to the old one before signing with it
+    rotated_jwks = issuer(old_key, new_key)
+    settings.OIDC_JWKS_REFRESH_INTERVAL = 0
+    token_payload["jti"] = "signed-before-the-rotation"
+    assert _authenticate(rf, _sign(token_payload, old_key)) == user
+    refresh = key_cache._refreshing.get(api_token_auth_settings.ISSUER)
+    if refresh is not None:
+        refresh.join(timeout=5)
+    assert rotated_jwks.call_count == 1
+
+    settings.OIDC_JWKS_REFRESH_INTERVAL = 60
+    token_payload["jti"] = "signed-after-the-rotation"
+    assert _authenticate(rf, _sign(token_payload, new_key)) == user
+    assert rotated_jwks.call_count == 1
@@ -16,6 +16,7 @@ urlpatterns = [
             GraphQLView.as_view(graphiql=settings.ENABLE_GRAPHIQL or settings.DEBUG)
         ),
     ),
+    path("profiles/", include("profiles.urls")),
     path("profiles/", include("youths.urls")),
 ]
 
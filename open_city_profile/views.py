@@ -9,6 +9,7 @@ from open_city_profile.consts import (
     CONNECTED_SERVICE_DELETION_FAILED_ERROR,
     CONNECTED_SERVICE_DELETION_NOT_ALLOWED_ERROR,
     GENERAL_ERROR,
+    INVALID_CURSOR_ERROR,
     INVALID_EMAIL_FORMAT_ERROR,
     OBJECT_DOES_NOT_EXIST_ERROR,
     PERMISSION_DENIED_ERROR,
@@ -23,6 +24,7 @@ from open_city_profile.exceptions import (
     CannotPerformThisActionWithGivenServiceType,
     ConnectedServiceDeletionFailedError,
     ConnectedServiceDeletionNotAllowedError,
+    InvalidCursorError,
     InvalidEmailFormatError,
     ProfileDoesNotExistError,
     ProfileGraphQLError,
@@ -54,6 +56,7 @@ error_codes_shared = {
     APINotImplementedError: API_NOT_IMPLEMENTED_ERROR,
     CannotPerformThisActionWithGivenServiceType: CANNOT_PERFORM_THIS_ACTION_WITH_GIVEN_SERVICE_TYPE_ERROR,
     InvalidEmailFormatError: INVALID_EMAIL_FORMAT_ERROR,
+    InvalidCursorError: INVALID_CURSOR_ERROR,
 }
 
 error_codes_profile = {
@@ -1,17 +1,18 @@
-import json
 from functools import reduce
 
 from django import forms
+from django.conf import settings
 from django.contrib import admin, messages
 from django.core.exceptions import PermissionDenied
 from django.forms.models import ModelForm
-from django.http import JsonResponse
-from django.shortcuts import render
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import path
 from django.utils.decorators import method_decorator
 from munigeo.models import AdministrativeDivision
 from reversion.admin import VersionAdmin
 
+from profiles.importer import start_import_job
 from profiles.models import (
     Address,
     ClaimToken,
@@ -19,10 +20,12 @@ from profiles.models import (
     LegalRelationship,
     Phone,
     Profile,
+    ProfileImportJob,
     SensitiveData,
 )
 from services.admin import ServiceConnectionInline
 from subscriptions.admin import SubscriptionInline
+from utils.streaming import iter_json, JSONObject
 from youths.admin import YouthProfileAdminInline
 
 
@@ -123,27 +126,59 @@ class ExtendedProfileAdmin(VersionAdmin):
 
     def get_urls(self):
         urls = super().get_urls()
-        my_urls = [path("upload-json/", self.upload_json, name="upload-json")]
+        my_urls = [
+            path("upload-json/", self.upload_json, name="upload-json"),
+            path(
+                "upload-json/<uuid:job_id>/",
+                self.import_job_status,
+                name="upload-json-status",
+            ),
+            path(
+                "upload-json/<uuid:job_id>/result/",
+                self.import_job_result,
+                name="upload-json-result",
+            ),
+        ]
         return my_urls + urls
 
     @method_decorator(superuser_required, name="dispatch")
     def upload_json(self, request):
-        try:
-            if request.method == "POST":
-                data = json.loads(request.FILES["json_file"].read())
-                result = Profile.import_customer_data(data)
-                response = JsonResponse(result)
-                response["Content-Disposition"] = "attachment; filename=export.json"
-                return response
-            else:
-                form = ImportProfilesFromJsonForm()
-                return render(
-                    request, "admin/profiles/upload_json.html", {"form": form}
+        if request.method == "POST":
+            form = ImportProfilesFromJsonForm(request.POST, request.FILES)
+            if form.is_valid():
+                job = ProfileImportJob.objects.create(
+                    file=form.cleaned_data["json_file"],
+                    chunk_size=settings.PROFILE_IMPORT_CHUNK_SIZE,
                 )
-        except Exception as err:
-            messages.error(request, err)
+                start_import_job(job)
+                return redirect("admin:upload-json-status", job_id=job.pk)
+        else:
             form = ImportProfilesFromJsonForm()
-            return render(request, "admin/profiles/upload_json.html", {"form": form})
+        return render(
+            request,
+            "admin/profiles/upload_json.html",
+            {"form": form, "jobs": ProfileImportJob.objects.all()[:10]},
+        )
+
+    @method_decorator(superuser_required, name="dispatch")
+    def import_job_status(self, request, job_id):
+        job = get_object_or_404(ProfileImportJob, pk=job_id)
+        if request.method == "POST":
+            # Resume a failed or interrupted job from its last saved chunk
+            if job.is_resumable:
+                start_import_job(job)
+                messages.info(request, "Import resumed")
+            return redirect("admin:upload-json-status", job_id=job.pk)
+        return render(request, "admin/profiles/upload_json_status.html", {"job": job})
+
+    @method_decorator(superuser_required, name="dispatch")
+    def import_job_result(self, request, job_id):
+        job = get_object_or_404(ProfileImportJob, pk=job_id)
+        response = StreamingHttpResponse(
+            iter_json(JSONObject(job.iter_result())), content_type="application/json"
+        )
+        response["Content-Disposition"] = "attachment; filename=export.json"
+        return response
 
     def formfield_for_manytomany(self, db_field, request, **kwargs):
         if db_field.name == "divisions_of_interest":
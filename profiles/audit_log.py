@@ -0,0 +1,166 @@
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedAuditLogHandler(logging.Handler):
+    """
+    Logging handler that moves writing the audit log off the request thread.
+
+    Formatted records are put into a bounded in-memory queue, from which a background
+    writer thread writes them in batches to the configured sink:
+
+    - "stdout", records are written to the standard output
+    - "file", records are appended to the file given in `filename`
+
+    If the queue stays full for longer than `put_timeout` seconds, the record is dropped
+    and counted in `dropped_count`. The remaining queue is written when the handler is
+    flushed or closed, which the logging module does on interpreter shutdown.
+
+    The writer thread logs the queue depth and the counters to the profiles.audit_log
+    logger every `metrics_interval` seconds, unless it is 0.
+    """
+
+    def __init__(
+        self,
+        sink="stdout",
+        filename=None,
+        queue_size=10000,
+        batch_size=100,
+        put_timeout=0.1,
+        metrics_interval=60,
+    ):
+        super().__init__()
+        if sink == "stdout":
+            self.stream = sys.stdout
+        elif sink == "file":
+            if not filename:
+                raise ValueError("filename is required for the file audit log sink")
+            self.stream = open(filename, "a", encoding="utf-8")
+        else:
+            raise ValueError("Invalid audit log sink: '{}'".format(sink))
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.metrics_interval = metrics_interval
+        self.dropped_count = 0
+        self.written_count = 0
+        self._counts_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def get_metrics(self):
+        with self._counts_lock:
+            dropped_count = self.dropped_count
+            written_count = self.written_count
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_size": self.queue.maxsize,
+            "dropped_count": dropped_count,
+            "written_count": written_count,
+        }
+
+    def log_metrics(self):
+        metrics = self.get_metrics()
+        logger.log(
+            logging.WARNING if metrics["dropped_count"] else logging.INFO,
+            "Audit log queue: %(queue_depth)d/%(queue_size)d queued, "
+            "%(dropped_count)d dropped, %(written_count)d written",
+            metrics,
+        )
+
+    def _ensure_writer(self):
+        # The writer thread does not survive forking (e.g. uWSGI workers), so it is
+        # started lazily in the process which emits the records.
+        if self._writer_pid != os.getpid() or not self._writer.is_alive():
+            with self.lock:
+                if self._writer_pid != os.getpid() or not self._writer.is_alive():
+                    self._writer = threading.Thread(
+                        target=self._write_from_queue,
+                        name="audit-log-writer",
+                        daemon=True,
+                    )
+                    self._writer_pid = os.getpid()
+                    self._writer.start()
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        self._ensure_writer()
+        try:
+            self.queue.put(message, timeout=self.put_timeout)
+        except queue.Full:
+            with self._counts_lock:
+                self.dropped_count += 1
+
+    def _get_batch(self, block=True, timeout=None):
+        batch = []
+        try:
+            batch.append(self.queue.get(block=block, timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, messages):
+        if not messages:
+            return
+        with self._write_lock:
+            self.stream.write("".join(message + "\n" for message in messages))
+            self.stream.flush()
+        with self._counts_lock:
+            self.written_count += len(messages)
+
+    def _write_from_queue(self):
+        metrics_at = None
+        if self.metrics_interval:
+            metrics_at = time.monotonic() + self.metrics_interval
+        while True:
+            timeout = None
+            if metrics_at is not None:
+                timeout = max(metrics_at - time.monotonic(), 0)
+            batch = self._get_batch(timeout=timeout)
+            stop = _STOP in batch
+            try:
+                self._write([message for message in batch if message is not _STOP])
+            except Exception:
+                logger.exception("Writing audit log failed")
+            if metrics_at is not None and time.monotonic() >= metrics_at:
+                self.log_metrics()
+                metrics_at = time.monotonic() + self.metrics_interval
+            if stop:
+                return
+
+    def flush(self):
+        """Write everything that is currently in the queue."""
+        batch = self._get_batch(block=False)
+        while batch:
+            self._write([message for message in batch if message is not _STOP])
+            batch = self._get_batch(block=False)
+
+    def close(self):
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            self.queue.put(_STOP)
+            self._writer.join(timeout=5)
+        self.flush()
+        if self.sink == "file":
+            self.stream.close()
+        super().close()
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+
+from .models import Address, Email, Phone, PrimaryContactInfo, Profile
+
+# PrimaryContactInfo fields copied from the primary object of each contact model
+PRIMARY_CONTACT_INFO_FIELDS = {
+    Email: ("email",),
+    Phone: ("phone",),
+    Address: ("address", "postal_code", "city", "country_code"),
+}
+
+
+def get_primary_contact_values(model, profile_id):
+    fields = PRIMARY_CONTACT_INFO_FIELDS[model]
+    values = (
+        model.objects.filter(profile_id=profile_id, primary=True)
+        .order_by("pk")
+        .values(*fields)
+        .first()
+    )
+    return values or dict.fromkeys(fields)
+
+
+def post_save_profile_primary_contact_info(sender, instance, created, **kwargs):
+    # Every profile has a row, so that ordering by it doesn't need an outer join
+    if created:
+        PrimaryContactInfo.objects.get_or_create(profile=instance)
+
+
+def post_save_primary_contact_info(sender, instance, **kwargs):
+    PrimaryContactInfo.objects.update_or_create(
+        profile_id=instance.profile_id,
+        defaults=get_primary_contact_values(sender, instance.profile_id),
+    )
+
+
+def post_delete_primary_contact_info(sender, instance, **kwargs):
+    # Only update an existing row, since the contact may be deleted along with the profile
+    PrimaryContactInfo.objects.filter(profile_id=instance.profile_id).update(
+        **get_primary_contact_values(sender, instance.profile_id)
+    )
+
+
+post_save.connect(post_save_profile_primary_contact_info, sender=Profile)
+for contact_model in PRIMARY_CONTACT_INFO_FIELDS:
+    post_save.connect(post_save_primary_contact_info, sender=contact_model)
+    post_delete.connect(post_delete_primary_contact_info, sender=contact_model)
@@ -0,0 +1,77 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+COUNT_MODE_EXACT = "exact"
+COUNT_MODE_ESTIMATE = "estimate"
+COUNT_MODE_AUTO = "auto"
+
+
+def get_estimated_count(queryset):
+    """
+    Returns the number of rows the PostgreSQL planner estimates the queryset to have.
+
+    The estimate is read from the plan of the query, which the planner derives from the
+    table statistics (reltuples) and the selectivity of the filters without reading the rows.
+    """
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count(queryset, mode):
+    if mode != COUNT_MODE_EXACT:
+        estimate = get_estimated_count(queryset)
+        # small results are cheap to count exactly
+        if (
+            mode == COUNT_MODE_ESTIMATE
+            or estimate > settings.PROFILE_COUNT_ESTIMATE_THRESHOLD
+        ):
+            return estimate
+    return queryset.count()
+
+
+def _get_cache_key(queryset, mode):
+    # the query contains the service and the filter arguments it was built from
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        sql, params = None, ()
+    digest = hashlib.sha1(repr((queryset.db, sql, params)).encode()).hexdigest()
+    return f"profile_count:{mode}:{digest}"
+
+
+def count_profiles(queryset):
+    """
+    Returns the number of profiles in the queryset with the counting mode of the settings.
+
+    - exact: count the rows of the queryset
+    - estimate: use the planner estimate of the queryset
+    - auto: use the planner estimate if it is above PROFILE_COUNT_ESTIMATE_THRESHOLD,
+      otherwise count the rows
+
+    If PROFILE_COUNT_CACHE_TIMEOUT is set, the count of the same query is cached for that
+    many seconds.
+    """
+    mode = settings.PROFILE_COUNT_MODE
+    timeout = settings.PROFILE_COUNT_CACHE_TIMEOUT
+    if not timeout:
+        return _count(queryset, mode)
+
+    key = _get_cache_key(queryset, mode)
+    count = cache.get(key)
+    if count is None:
+        count = _count(queryset, mode)
+        cache.set(key, count, timeout)
+    return count
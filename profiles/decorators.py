@@ -4,8 +4,7 @@ from django.core.exceptions import PermissionDenied
 from django.utils.translation import ugettext_lazy as _
 from graphql.execution.base import ResolveInfo
 
-from profiles.utils import set_current_service
-from services.models import Service
+from profiles.utils import get_service_permissions, set_current_service
 
 
 def context(f):
@@ -37,9 +36,11 @@ def staff_required(required_permission="view"):
                         required_permission
                     )
                 )
-            service = Service.objects.get(service_type=kwargs["service_type"])
+            # services and permissions are loaded once per request, e.g. for nested mutations
+            permissions = get_service_permissions(context)
+            service = permissions.get_service(kwargs["service_type"])
             set_current_service(service.service_type)
-            if context.user.has_perm(
+            if permissions.has_perm(
                 "can_{}_profiles".format(required_permission), service
             ):
                 return function(*args, **kwargs)
@@ -72,3 +72,16 @@ class AddressType(Enum):
         WORK = _("Work address")
         HOME = _("Home address")
         OTHER = _("Other address")
+
+
+class ImportJobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    class Labels:
+        PENDING = _("Pending")
+        RUNNING = _("Running")
+        COMPLETED = _("Completed")
+        FAILED = _("Failed")
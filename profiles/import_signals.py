@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+
+from .models import ProfileImportJob
+
+
+def post_delete_profile_import_job(sender, instance, **kwargs):
+    instance.delete_file()
+
+
+post_delete.connect(post_delete_profile_import_job, sender=ProfileImportJob)
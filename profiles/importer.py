@@ -0,0 +1,232 @@
+import codecs
+import csv
+import json
+import logging
+import re
+import threading
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .enums import ImportJobStatus
+from .models import Profile, ProfileImportJob, ProfileImportMapping
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class _JsonArrayReader:
+    def __init__(self, file, read_size):
+        self.file = file
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+
+    def next_character(self):
+        """Skip whitespace and return the next character, or "" at the end of file."""
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            self.buffer = self.file.read(self.read_size)
+            self.position = 0
+            if not self.buffer:
+                return ""
+
+    def decode_value(self):
+        """Decode the next value, reading more of the file until it is complete."""
+        self.next_character()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # A value ending at the end of the buffer may continue in the file
+            if end is not None and end < len(self.buffer):
+                break
+            data = self.file.read(self.read_size)
+            if not data:
+                if end is None:
+                    # Raise the actual decode error
+                    self.decoder.raw_decode(self.buffer, self.position)
+                break
+            consumed = self.position
+            self.buffer = self.buffer[consumed:] + data
+            self.position = 0
+        self.position = end
+        return value
+
+
+def iter_json_array(file, read_size=64 * 1024):
+    """
+    Yield the items of the JSON array in the given text file one at a time.
+
+    Only the item being parsed is kept in memory, so arbitrarily large arrays can be read.
+    """
+    reader = _JsonArrayReader(file, read_size)
+    if reader.next_character() != "[":
+        raise ValueError("Expected a JSON array")
+    reader.position += 1
+    if reader.next_character() == "]":
+        return
+
+    while True:
+        yield reader.decode_value()
+        separator = reader.next_character()
+        reader.position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(
+                "Expected ',' or ']' in JSON array, got {!r}".format(separator)
+            )
+
+
+def iter_ndjson(file):
+    """Yield the values of the newline delimited JSON file, ignoring empty lines."""
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv_customers(file):
+    """
+    Yield the customers of the CSV file in the import format.
+
+    The CSV file has a header row with the columns customer_id, first_name, last_name,
+    email, ssn, address, postal_code, city and phones, multiple phones separated by ";".
+    """
+    for row in csv.DictReader(file):
+        customer = {
+            key: row[key]
+            for key in ("customer_id", "first_name", "last_name", "email", "ssn")
+            if row.get(key)
+        }
+        if any(row.get(key) for key in ("address", "postal_code", "city")):
+            customer["address"] = {
+                key: row.get(key) or "" for key in ("address", "postal_code", "city")
+            }
+        customer["phones"] = [
+            phone.strip()
+            for phone in (row.get("phones") or "").split(";")
+            if phone.strip()
+        ]
+        yield customer
+
+
+def import_customers(customers, start_index=0):
+    """
+    Import the customers, skipping the ones that fail to import.
+
+    Returns the customer_id -> profile UUID mapping of the imported customers and a list of
+    errors of the skipped ones. A failing list is split in halves until the failing
+    customers are found, so that the rest are still imported in bulk.
+    """
+    try:
+        return Profile.import_customer_data(customers, start_index=start_index), []
+    except Exception as err:
+        if len(customers) == 1:
+            customer = customers[0]
+            error = {
+                "index": start_index,
+                "customer_id": customer.get("customer_id")
+                if isinstance(customer, dict)
+                else None,
+                "error": str(err),
+                "reason": str(err.__cause__) if err.__cause__ else "",
+            }
+            return {}, [error]
+        middle = len(customers) // 2
+        result, errors = import_customers(customers[:middle], start_index)
+        rest_result, rest_errors = import_customers(
+            customers[middle:], start_index + middle
+        )
+        result.update(rest_result)
+        return result, errors + rest_errors
+
+
+class ImportJobTakenOver(Exception):
+    """Another run of the import job has saved progress since this run last did."""
+
+
+def _import_chunk(job, chunk):
+    with transaction.atomic():
+        # A run considered interrupted may still be alive, only one of them can continue
+        saved_job = ProfileImportJob.objects.select_for_update().get(pk=job.pk)
+        if saved_job.processed_count != job.processed_count:
+            raise ImportJobTakenOver()
+        result = Profile.import_customer_data(
+            chunk, batch_size=job.chunk_size, start_index=job.processed_count
+        )
+        ProfileImportMapping.objects.bulk_create(
+            ProfileImportMapping(job=job, customer_id=customer_id, profile_id=profile_id)
+            for customer_id, profile_id in result.items()
+        )
+        job.processed_count += len(chunk)
+        job.save(update_fields=("processed_count", "updated_at"))
+
+
+def run_import_job(job_id):
+    """
+    Run the pending, failed or interrupted import job, continuing from its last saved chunk.
+
+    Does nothing if the job is completed or running without being interrupted.
+    """
+    started = (
+        ProfileImportJob.objects.filter(pk=job_id)
+        .filter(
+            models.Q(status=ImportJobStatus.PENDING)
+            | ProfileImportJob.get_resumable_filter()
+        )
+        .update(status=ImportJobStatus.RUNNING, error="", updated_at=timezone.now())
+    )
+    if not started:
+        return
+    job = ProfileImportJob.objects.get(pk=job_id)
+
+    try:
+        with job.file.open("rb") as file:
+            items = iter_json_array(codecs.getreader("utf-8")(file))
+            chunk = []
+            for index, item in enumerate(items):
+                if index < job.processed_count:
+                    continue
+                chunk.append(item)
+                if len(chunk) == job.chunk_size:
+                    _import_chunk(job, chunk)
+                    chunk = []
+            if chunk:
+                _import_chunk(job, chunk)
+    except ImportJobTakenOver:
+        logger.warning("Profile import job %s was resumed by another run", job.pk)
+    except Exception as err:
+        logger.exception("Profile import job %s failed", job.pk)
+        job.status = ImportJobStatus.FAILED
+        job.error = str(err)
+        job.save(update_fields=("status", "error", "updated_at"))
+    else:
+        job.status = ImportJobStatus.COMPLETED
+        job.save(update_fields=("status", "updated_at"))
+        # The file contains personal data which is not needed anymore
+        job.delete_file()
+
+
+def _run_import_job_in_thread(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        connection.close()
+
+
+def start_import_job(job):
+    """Run the import job in a background thread once the current transaction commits."""
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=_run_import_job_in_thread,
+            args=(job.pk,),
+            name="profile-import",
+            daemon=True,
+        ).start()
+    )
@@ -0,0 +1,126 @@
+import uuid
+
+from django.core.exceptions import PermissionDenied
+from django.utils.translation import ugettext_lazy as _
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from .models import Address, Email, Phone, Profile, SensitiveData
+from .utils import get_profiles_visible_to_staff
+
+
+class PrimaryContactInfoLoader(DataLoader):
+    """Batch loads the primary contact info of the given model for a set of profiles.
+
+    The loader is keyed by profile ID and resolves to the primary instance of the
+    model or None if the profile has no primary instance.
+    """
+
+    model = None
+
+    def batch_load_fn(self, profile_ids):
+        primary_items = {}
+        for item in self.model.objects.filter(
+            profile_id__in=profile_ids, primary=True
+        ).order_by("pk"):
+            primary_items.setdefault(item.profile_id, item)
+        return Promise.resolve(
+            [primary_items.get(profile_id) for profile_id in profile_ids]
+        )
+
+
+class PrimaryEmailLoader(PrimaryContactInfoLoader):
+    model = Email
+
+
+class PrimaryPhoneLoader(PrimaryContactInfoLoader):
+    model = Phone
+
+
+class PrimaryAddressLoader(PrimaryContactInfoLoader):
+    model = Address
+
+
+class SensitiveDataLoader(DataLoader):
+    """Batch loads the sensitive data of a set of profiles.
+
+    The loader is keyed by profile ID and resolves to the SensitiveData of the profile or
+    None if the profile has none.
+    """
+
+    def batch_load_fn(self, profile_ids):
+        sensitive_data = SensitiveData.objects.in_bulk(
+            profile_ids, field_name="profile_id"
+        )
+        return Promise.resolve(
+            [sensitive_data.get(profile_id) for profile_id in profile_ids]
+        )
+
+
+def _to_uuid(value):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+
+class ProfileReferenceLoader(DataLoader):
+    """Batch loads the profiles of federated entity references for a user.
+
+    The loader is keyed by profile ID and resolves to the profile or None if it does
+    not exist. A profile the user is neither the owner of nor may view as staff resolves
+    to a PermissionDenied error.
+    """
+
+    def __init__(self, user, **kwargs):
+        super().__init__(**kwargs)
+        self.user = user
+
+    def batch_load_fn(self, profile_ids):
+        uuids = [_to_uuid(profile_id) for profile_id in profile_ids]
+        profiles = Profile.objects.in_bulk([pk for pk in uuids if pk])
+        visible_ids = get_profiles_visible_to_staff(
+            self.user,
+            [
+                profile
+                for profile in profiles.values()
+                if profile.user_id != self.user.pk
+            ],
+        )
+
+        results = []
+        for pk in uuids:
+            profile = profiles.get(pk)
+            if (
+                profile is None
+                or profile.user_id == self.user.pk
+                or profile.pk in visible_ids
+            ):
+                results.append(profile)
+            else:
+                results.append(
+                    PermissionDenied(
+                        _("You do not have permission to perform this action.")
+                    )
+                )
+        return Promise.resolve(results)
+
+
+def get_loader(context, loader_class, *args):
+    """Return the request specific instance of the given loader class.
+
+    Loaders are stored to the request context so that the batching and caching
+    is limited to a single request. The extra arguments are passed to the loader
+    class and are a part of the key of the loader instance.
+    """
+    if context is None:
+        return loader_class(*args)
+
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = {}
+        context.loaders = loaders
+    key = (loader_class, *args)
+    if key not in loaders:
+        loaders[key] = loader_class(*args)
+    return loaders[key]
@@ -2,11 +2,19 @@ import json
 import logging
 from datetime import datetime
 
+from django.apps import apps
 from django.conf import settings
+from django.db.models import F
 from django.db.models.signals import post_delete, post_init, post_save
-from django.dispatch import receiver
 
-from .utils import get_current_service, get_current_user
+from users.models import User
+
+from .utils import (
+    get_audit_log_reads,
+    get_current_service,
+    get_current_user,
+    pop_audit_log_reads,
+)
 
 
 def should_audit(model):
@@ -15,9 +23,9 @@ def should_audit(model):
     return False
 
 
-def log(action, instance):
-    def _resolve_role(current_user, profile):
-        if profile.user == current_user:
+def _log_event(action, instance_class_name, profile_id, target_user):
+    def _resolve_role(current_user, target_user):
+        if target_user == current_user:
             return "OWNER"
         elif current_user is not None:
             return "ADMIN"
@@ -29,74 +37,119 @@ def log(action, instance):
         "SensitiveData": "sensitive data",
     }
 
+    logger = logging.getLogger("audit")
+
+    current_time = datetime.utcnow()
+    current_user = get_current_user()
+
+    message = {
+        "audit_event": {
+            "origin": "PROFILE-BE",
+            "status": "SUCCESS",
+            "date_time_epoch": int(current_time.timestamp()),
+            "date_time": f"{current_time.isoformat(sep='T', timespec='milliseconds')}Z",
+            "actor": {"role": _resolve_role(current_user, target_user)},
+            "operation": action,
+            "target": {
+                "profile_id": str(profile_id) if profile_id else None,
+                "profile_part": profile_parts[instance_class_name],
+            },
+        }
+    }
+
+    if current_user:
+        message["audit_event"]["actor"]["user_id"] = (
+            str(current_user.uuid) if hasattr(current_user, "uuid") else None
+        )
+        if settings.AUDIT_LOG_USERNAME:
+            message["audit_event"]["actor"]["user_name"] = (
+                current_user.username if hasattr(current_user, "username") else None
+            )
+
+    if target_user:
+        message["audit_event"]["target"]["user_id"] = (
+            str(target_user.uuid) if hasattr(target_user, "uuid") else None
+        )
+        if settings.AUDIT_LOG_USERNAME:
+            message["audit_event"]["target"]["user_name"] = (
+                target_user.username if hasattr(target_user, "username") else None
+            )
+
+    service = get_current_service()
+    if service:
+        message["audit_event"]["actor_service"] = {
+            "id": str(service.name),
+            "name": str(service.label),
+        }
+    logger.info(json.dumps(message))
+
+
+def log(action, instance):
     if (
         settings.AUDIT_LOGGING_ENABLED
         and should_audit(instance.__class__)
         and instance.pk
     ):
-        logger = logging.getLogger("audit")
-
-        current_time = datetime.utcnow()
-        current_user = get_current_user()
         profile = instance.resolve_profile()
-        profile_id = str(profile.pk) if profile else None
-        target_user = profile.user if profile and profile.user else None
-
-        message = {
-            "audit_event": {
-                "origin": "PROFILE-BE",
-                "status": "SUCCESS",
-                "date_time_epoch": int(current_time.timestamp()),
-                "date_time": f"{current_time.isoformat(sep='T', timespec='milliseconds')}Z",
-                "actor": {"role": _resolve_role(current_user, profile)},
-                "operation": action,
-                "target": {
-                    "profile_id": profile_id,
-                    "profile_part": profile_parts[instance.__class__.__name__],
-                },
-            }
-        }
-
-        if current_user:
-            message["audit_event"]["actor"]["user_id"] = (
-                str(current_user.uuid) if hasattr(current_user, "uuid") else None
-            )
-            if settings.AUDIT_LOG_USERNAME:
-                message["audit_event"]["actor"]["user_name"] = (
-                    current_user.username if hasattr(current_user, "username") else None
-                )
-
-        if target_user:
-            message["audit_event"]["target"]["user_id"] = (
-                str(target_user.uuid) if hasattr(target_user, "uuid") else None
-            )
-            if settings.AUDIT_LOG_USERNAME:
-                message["audit_event"]["target"]["user_name"] = (
-                    target_user.username if hasattr(target_user, "username") else None
-                )
-
-        service = get_current_service()
-        if service:
-            message["audit_event"]["actor_service"] = {
-                "id": str(service.name),
-                "name": str(service.label),
-            }
-        logger.info(json.dumps(message))
+        _log_event(
+            action,
+            instance.__class__.__name__,
+            profile.pk if profile else None,
+            profile.user if profile else None,
+        )
+
+
+def flush_audit_log_reads():
+    """Log the READ events collected during the request.
+
+    Every read profile part is logged once per request and the users of the read
+    profiles are resolved with a single query.
+    """
+    reads = pop_audit_log_reads()
+    if not reads or not settings.AUDIT_LOGGING_ENABLED:
+        return
+
+    profile_ids = {profile_id for instance_class_name, profile_id in reads}
+    target_users = {
+        user.audit_profile_id: user
+        for user in User.objects.filter(profile__pk__in=profile_ids).annotate(
+            audit_profile_id=F("profile__pk")
+        )
+    }
+    for instance_class_name, profile_id in reads:
+        _log_event(
+            "READ", instance_class_name, profile_id, target_users.get(profile_id)
+        )
 
 
-@receiver(post_delete)
 def post_delete_audit_log(sender, instance, **kwargs):
     log("DELETE", instance)
 
 
-@receiver(post_init)
 def post_init_audit_log(sender, instance, **kwargs):
-    log("READ", instance)
+    if not settings.AUDIT_LOGGING_ENABLED or not instance.pk:
+        return
+
+    reads = get_audit_log_reads()
+    if reads is None:
+        # Not collecting reads e.g. outside of a request, log the read right away
+        log("READ", instance)
+    else:
+        reads.setdefault(
+            (instance.__class__.__name__, instance.resolve_profile_id()), None
+        )
 
 
-@receiver(post_save)
 def post_save_audit_log(sender, instance, created, **kwargs):
     if created:
         log("CREATE", instance)
     else:
         log("UPDATE", instance)
+
+
+# Receivers are connected only for the audited models, so that instantiating
+# any other model does not go through the audit logging at all.
+for audited_model in filter(should_audit, apps.get_models()):
+    post_delete.connect(post_delete_audit_log, sender=audited_model)
+    post_init.connect(post_init_audit_log, sender=audited_model)
+    post_save.connect(post_save_audit_log, sender=audited_model)
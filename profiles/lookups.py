@@ -0,0 +1,27 @@
+from django.db.models import CharField, Lookup, TextField
+
+
+class ILikeContains(Lookup):
+    """
+    Case-insensitive containment using ILIKE.
+
+    Unlike icontains, which compiles to UPPER(column) LIKE UPPER(value), the column is
+    compared as is, so the query can use the trigram (gin_trgm_ops) index of the column.
+    """
+
+    lookup_name = "ilike_contains"
+
+    def process_rhs(self, compiler, connection):
+        rhs, params = super().process_rhs(compiler, connection)
+        if self.rhs_is_direct_value():
+            params = ["%{}%".format(connection.ops.prep_for_like_query(params[0]))]
+        return rhs, params
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return "{} ILIKE {}".format(lhs, rhs), lhs_params + rhs_params
+
+
+CharField.register_lookup(ILikeContains)
+TextField.register_lookup(ILikeContains)
@@ -0,0 +1,140 @@
+import csv
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import prefetch_related_objects
+
+from profiles.models import Profile
+from services.enums import ServiceType
+from utils.streaming import iter_json
+
+CSV_COLUMNS = (
+    "id",
+    "first_name",
+    "last_name",
+    "nickname",
+    "language",
+    "contact_method",
+    "email",
+    "phone",
+    "address",
+    "postal_code",
+    "city",
+    "country_code",
+    "service_types",
+)
+
+
+def iter_profile_chunks(queryset, chunk_size):
+    """
+    Yield the profiles of the queryset in chunks with the serialized relations prefetched.
+
+    The profiles are read with a server side cursor and the relations are prefetched one
+    chunk at a time, so the memory use does not depend on the number of profiles.
+    """
+    prefetches = Profile.get_serialization_prefetches()
+    chunk = []
+    for profile in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(profile)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *prefetches)
+            yield chunk
+            chunk = []
+    if chunk:
+        prefetch_related_objects(chunk, *prefetches)
+        yield chunk
+
+
+def _get_primary(contacts):
+    return next((contact for contact in contacts if contact.primary), None)
+
+
+def get_csv_row(profile):
+    """Returns the flat CSV projection of a profile with prefetched relations."""
+    email = _get_primary(profile.emails.all())
+    phone = _get_primary(profile.phones.all())
+    address = _get_primary(profile.addresses.all())
+    return (
+        profile.pk,
+        profile.first_name,
+        profile.last_name,
+        profile.nickname,
+        profile.language,
+        profile.contact_method,
+        email.email if email else "",
+        phone.phone if phone else "",
+        address.address if address else "",
+        address.postal_code if address else "",
+        address.city if address else "",
+        address.country_code if address else "",
+        ";".join(
+            service_connection.service.service_type.name
+            for service_connection in profile.service_connections.all()
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Export profiles as their serialized GDPR data in NDJSON, one profile per line, "
+        "or as a flat CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_file", type=str, help="File to write the export to")
+        parser.add_argument(
+            "-f",
+            "--format",
+            choices=("ndjson", "csv"),
+            default="ndjson",
+            help="Format of the export, defaults to ndjson",
+        )
+        parser.add_argument(
+            "-z",
+            "--gzip",
+            action="store_true",
+            help="Compress the export with gzip",
+        )
+        parser.add_argument(
+            "-s",
+            "--service-type",
+            type=str,
+            help="Export only profiles connected to the service type, e.g. BERTH",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of profiles read from the database at a time",
+        )
+
+    def handle(self, *args, **kwargs):
+        queryset = Profile.objects.order_by("pk")
+        if kwargs["service_type"]:
+            try:
+                service_type = ServiceType[kwargs["service_type"]]
+            except KeyError:
+                raise CommandError("Invalid service_type given")
+            queryset = queryset.filter(
+                service_connections__service__service_type=service_type
+            )
+
+        open_output = gzip.open if kwargs["gzip"] else open
+        count = 0
+        with open_output(
+            kwargs["output_file"], "wt", encoding="utf-8", newline=""
+        ) as output:
+            writer = csv.writer(output) if kwargs["format"] == "csv" else None
+            if writer:
+                writer.writerow(CSV_COLUMNS)
+            for chunk in iter_profile_chunks(queryset, kwargs["chunk_size"]):
+                for profile in chunk:
+                    if writer:
+                        writer.writerow(get_csv_row(profile))
+                    else:
+                        output.writelines(iter_json(profile.iter_serialized()))
+                        output.write("\n")
+                count += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS("Exported {} profiles".format(count)))
@@ -0,0 +1,161 @@
+import concurrent.futures
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from profiles.importer import (
+    import_customers,
+    iter_csv_customers,
+    iter_json_array,
+    iter_ndjson,
+)
+from services.enums import ServiceType
+from services.models import Service
+
+READERS = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv_customers}
+
+FORMAT_EXTENSIONS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+
+def iter_chunks(items, chunk_size):
+    chunk = []
+    start_index = 0
+    for index, item in enumerate(items):
+        if not chunk:
+            start_index = index
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield start_index, chunk
+            chunk = []
+    if chunk:
+        yield start_index, chunk
+
+
+def _close_inherited_connections():
+    # Every worker process has to open its own database connection
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import customer profiles from a JSON, NDJSON or CSV file. The file is imported in "
+        "chunks by a pool of worker processes. The created profile ids are written to the "
+        "output file and the customers which could not be imported to the error report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input_file", type=str, help="File to import")
+        parser.add_argument(
+            "-f",
+            "--format",
+            choices=sorted(READERS),
+            help="Format of the input file, by default detected from the file extension",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=str,
+            default="profile_ids.json",
+            help="File for the customer_id -> profile id mapping",
+        )
+        parser.add_argument(
+            "-e",
+            "--errors",
+            type=str,
+            default="import_errors.json",
+            help="File for the report of the customers which could not be imported",
+        )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes, 1 imports in this process",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=settings.PROFILE_IMPORT_CHUNK_SIZE,
+            help="Number of customers imported in a single transaction",
+        )
+
+    def handle(self, *args, **kwargs):
+        input_format = kwargs["format"] or FORMAT_EXTENSIONS.get(
+            os.path.splitext(kwargs["input_file"])[1].lower()
+        )
+        if input_format not in READERS:
+            raise CommandError("Unknown input format, use --format")
+        if not Service.objects.filter(service_type=ServiceType.BERTH).exists():
+            raise CommandError("Berth service does not exist")
+
+        imported_count = 0
+        errors = []
+        with open(
+            kwargs["input_file"], encoding="utf-8", newline=""
+        ) as input_file, open(kwargs["output"], "w", encoding="utf-8") as output:
+            chunks = iter_chunks(
+                READERS[input_format](input_file), kwargs["chunk_size"]
+            )
+            output.write("{")
+            for result, chunk_errors in self.import_chunks(chunks, kwargs["workers"]):
+                for customer_id, profile_id in result.items():
+                    output.write("," if imported_count else "")
+                    output.write(
+                        "\n  {}: {}".format(
+                            json.dumps(str(customer_id)), json.dumps(str(profile_id))
+                        )
+                    )
+                    imported_count += 1
+                errors.extend(chunk_errors)
+            output.write("\n}\n")
+
+        with open(kwargs["errors"], "w", encoding="utf-8") as error_report:
+            json.dump(
+                sorted(errors, key=lambda error: error["index"]), error_report, indent=2
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS("Imported {} profiles".format(imported_count))
+        )
+        if errors:
+            self.stdout.write(
+                self.style.ERROR(
+                    "{} customers could not be imported, see {}".format(
+                        len(errors), kwargs["errors"]
+                    )
+                )
+            )
+
+    def import_chunks(self, chunks, workers):
+        """Import the chunks and yield their results in the order they finish."""
+        if workers <= 1:
+            for start_index, chunk in chunks:
+                yield import_customers(chunk, start_index)
+            return
+
+        # Don't share the connection of this process with the forked workers
+        connections.close_all()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_close_inherited_connections
+        ) as executor:
+            pending = set()
+            for start_index, chunk in chunks:
+                # Keep a bounded number of chunks in memory
+                if len(pending) >= workers * 2:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(import_customers, chunk, start_index))
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
@@ -1,12 +1,19 @@
 from django.utils.deprecation import MiddlewareMixin
 
-from .utils import clear_thread_locals, set_current_user
+from .log_signals import flush_audit_log_reads
+from .utils import (
+    clear_thread_locals,
+    set_current_user,
+    start_collecting_audit_log_reads,
+)
 
 
 class SetUser(MiddlewareMixin):
     def process_request(self, request):
         set_current_user(getattr(request, "user", None))
+        start_collecting_audit_log_reads()
 
     def process_response(self, request, response):
+        flush_audit_log_reads()
         clear_thread_locals()
         return response
@@ -0,0 +1,79 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+import uuid
+
+import django.db.models.deletion
+import enumfields.fields
+from django.db import migrations, models
+
+import profiles.enums
+import profiles.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("profiles", "0026_email_verified"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileImportJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        storage=profiles.models.ProfileImportStorage(),
+                        upload_to="profile_imports/",
+                    ),
+                ),
+                ("chunk_size", models.PositiveIntegerField(default=1000)),
+                (
+                    "status",
+                    enumfields.fields.EnumField(
+                        default="pending",
+                        enum=profiles.enums.ImportJobStatus,
+                        max_length=16,
+                    ),
+                ),
+                ("processed_count", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={"ordering": ["-created_at"]},
+        ),
+        migrations.CreateModel(
+            name="ProfileImportMapping",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("customer_id", models.CharField(max_length=255)),
+                ("profile_id", models.UUIDField()),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mappings",
+                        to="profiles.ProfileImportJob",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def trigram_index(model_name, field_name):
+    return migrations.AddIndex(
+        model_name=model_name,
+        index=django.contrib.postgres.indexes.GinIndex(
+            fields=[field_name],
+            name=f"{model_name}_{field_name}_trgm",
+            opclasses=["gin_trgm_ops"],
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("profiles", "0027_add_profile_import_job"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        trigram_index("profile", "first_name"),
+        trigram_index("profile", "last_name"),
+        trigram_index("profile", "nickname"),
+        trigram_index("email", "email"),
+        trigram_index("phone", "phone"),
+        trigram_index("address", "address"),
+        trigram_index("address", "postal_code"),
+        trigram_index("address", "city"),
+    ]
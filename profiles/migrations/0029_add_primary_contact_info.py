@@ -0,0 +1,86 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PRIMARY_CONTACT_INFO_FIELDS = {
+    "Email": ("email",),
+    "Phone": ("phone",),
+    "Address": ("address", "postal_code", "city", "country_code"),
+}
+
+
+def populate_primary_contact_info(apps, schema_editor):
+    Profile = apps.get_model("profiles", "Profile")
+    PrimaryContactInfo = apps.get_model("profiles", "PrimaryContactInfo")
+    values_by_profile = defaultdict(dict)
+    for model_name, field_names in PRIMARY_CONTACT_INFO_FIELDS.items():
+        model = apps.get_model("profiles", model_name)
+        # The primary object with the lowest pk wins, if there are several
+        for values in (
+            model.objects.filter(primary=True)
+            .order_by("-pk")
+            .values("profile_id", *field_names)
+            .iterator()
+        ):
+            values_by_profile[values.pop("profile_id")].update(values)
+
+    # Every profile has a row, also the ones without primary contacts
+    PrimaryContactInfo.objects.bulk_create(
+        (
+            PrimaryContactInfo(
+                profile_id=profile_id, **values_by_profile.get(profile_id, {})
+            )
+            for profile_id in Profile.objects.values_list("pk", flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("profiles", "0028_add_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrimaryContactInfo",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="primary_contact_info",
+                        serialize=False,
+                        to="profiles.Profile",
+                    ),
+                ),
+                (
+                    "email",
+                    models.EmailField(db_index=True, max_length=254, null=True),
+                ),
+                (
+                    "phone",
+                    models.CharField(db_index=True, max_length=255, null=True),
+                ),
+                (
+                    "address",
+                    models.CharField(db_index=True, max_length=128, null=True),
+                ),
+                (
+                    "postal_code",
+                    models.CharField(db_index=True, max_length=32, null=True),
+                ),
+                ("city", models.CharField(db_index=True, max_length=64, null=True)),
+                (
+                    "country_code",
+                    models.CharField(db_index=True, max_length=2, null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate_primary_contact_info, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,16 @@
+import logging
 import os
 import shutil
+import time
 import uuid
+from datetime import timedelta
 
 import reversion
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.core.files.storage import FileSystemStorage
 from django.db import models, transaction
+from django.utils import timezone
 from encrypted_fields import fields
 from enumfields import EnumField
 from munigeo.models import AdministrativeDivision
@@ -14,17 +19,31 @@ from thesaurus.models import Concept
 from open_city_profile.exceptions import ProfileMustHaveOnePrimaryEmail
 from services.enums import ServiceType
 from services.models import Service, ServiceConnection
+from services.registry import get_services
+from services.utils import call_for_service_connections
 from users.models import User
 from utils.models import SerializableMixin, UUIDModel
 
 from .enums import (
     AddressType,
     EmailType,
+    ImportJobStatus,
     PhoneType,
     RepresentationType,
     RepresentativeConfirmationDegree,
 )
 
+logger = logging.getLogger(__name__)
+
+
+def trigram_index(model_name, field_name):
+    """Index for the case-insensitive containment and similarity searches of the field."""
+    return GinIndex(
+        fields=[field_name],
+        name=f"{model_name}_{field_name}_trgm",
+        opclasses=["gin_trgm_ops"],
+    )
+
 
 def get_user_media_folder(instance, filename):
     return "%s/profile_images/%s" % (instance.user.uuid, filename)
@@ -43,6 +62,26 @@ class OverwriteStorage(FileSystemStorage):
         return name
 
 
+class ProfileImportStorage(FileSystemStorage):
+    """
+    Storage for the uploaded profile import files, which contain personal data like SSNs.
+
+    The files are kept in PROFILE_IMPORT_ROOT, outside of the public MEDIA_ROOT, and they
+    have no URL.
+    """
+
+    @property
+    def base_location(self):
+        return settings.PROFILE_IMPORT_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError("Profile import files are not publicly accessible.")
+
+
 @reversion.register()
 class LegalRelationship(models.Model):
     representative = models.ForeignKey(  # "parent"
@@ -97,6 +136,14 @@ class Profile(UUIDModel, SerializableMixin):
     legal_relationships = models.ManyToManyField(
         "self", through=LegalRelationship, symmetrical=False
     )
+
+    class Meta:
+        indexes = [
+            trigram_index("profile", "first_name"),
+            trigram_index("profile", "last_name"),
+            trigram_index("profile", "nickname"),
+        ]
+
     serialize_fields = (
         {"name": "first_name"},
         {"name": "last_name"},
@@ -115,6 +162,9 @@ class Profile(UUIDModel, SerializableMixin):
     def resolve_profile(self):
         return self
 
+    def resolve_profile_id(self):
+        return self.pk
+
     def get_primary_email(self):
         return Email.objects.get(profile=self, primary=True)
 
@@ -149,16 +199,30 @@ class Profile(UUIDModel, SerializableMixin):
             return str(self.id)
 
     def get_service_gdpr_data(self):
-        """Download gdpr data for each connected service"""
-        data = map(
-            lambda service_connection: service_connection.download_gdpr_data(),
-            self.service_connections.all(),
+        """Download gdpr data for each connected service
+
+        The services are called concurrently, so the download takes as long as the slowest
+        service, at most the GDPR_API_DEADLINE. Services failing to respond are logged.
+        """
+        deadline = time.monotonic() + settings.GDPR_API_DEADLINE
+        results = call_for_service_connections(
+            self.service_connections.select_related("service"),
+            lambda service_connection: service_connection.download_gdpr_data(
+                deadline=deadline
+            ),
         )
-        return [item for item in list(data) if item]
+        for result in results:
+            if result.error:
+                logger.warning(
+                    "Downloading GDPR data from service %s failed: %s",
+                    result.service_connection.service.service_type.name,
+                    result.error,
+                )
+        return [result.result for result in results if result.result]
 
     @classmethod
     @transaction.atomic
-    def import_customer_data(cls, data):
+    def import_customer_data(cls, data, batch_size=1000, start_index=0):
         """
         Imports list of customers of the following shape:
         {
@@ -178,47 +242,29 @@ class Profile(UUIDModel, SerializableMixin):
             ]
         }
         And returns dict where key is the customer_id and value is the UUID of created profile object
+
+        The whole data set is validated before anything is saved, after which the objects are
+        inserted with bulk_create in batches of batch_size. Model signals are not sent for the
+        bulk created objects, so CREATE audit log events are logged explicitly.
+
+        start_index is the index of the first customer in data, used in the error messages
+        when importing a larger data set in parts.
         """
+        if not data:
+            return {}
+
+        berth_service = get_services().get(ServiceType.BERTH)
         result = {}
-        for customer_index, item in enumerate(data):
+        objects = {model: [] for model in _IMPORT_MODELS}
+        for customer_index, item in enumerate(data, start=start_index):
             try:
-                profile = Profile.objects.create(
-                    first_name=item.get("first_name", ""),
-                    last_name=item.get("last_name", ""),
-                )
-                ssn = item.get("ssn")
-                if ssn:
-                    SensitiveData.objects.create(ssn=ssn, profile=profile)
-                email = item.get("email", None)
-                if email:
-                    profile.emails.create(
-                        email=email, email_type=EmailType.PERSONAL, primary=True
-                    )
-                else:
-                    raise ProfileMustHaveOnePrimaryEmail(
-                        f"Profile must have exactly one primary email, index: {customer_index}"
-                    )
-                address = item.get("address", None)
-                if address:
-                    profile.addresses.create(
-                        address=address.get("address", ""),
-                        postal_code=address.get("postal_code", ""),
-                        city=address.get("city", ""),
-                        country_code="fi",
-                        address_type=AddressType.HOME,
-                        primary=True,
-                    )
-                phones = item.get("phones", ())
-                for index, phone in enumerate(phones):
-                    profile.phones.create(
-                        phone=phone, phone_type=PhoneType.MOBILE, primary=index == 0
-                    )
-                ServiceConnection.objects.create(
-                    profile=profile,
-                    service=Service.objects.get(service_type=ServiceType.BERTH),
-                    enabled=False,
+                customer_objects = _build_customer_objects(
+                    item, customer_index, berth_service
                 )
-                result[item["customer_id"]] = profile.pk
+                for obj in customer_objects:
+                    _validate_import_object(obj)
+                    objects[obj.__class__].append(obj)
+                result[item["customer_id"]] = customer_objects[0].pk
             except ProfileMustHaveOnePrimaryEmail:
                 raise
             except Exception as err:
@@ -232,6 +278,15 @@ class Profile(UUIDModel, SerializableMixin):
                     )
                 )
                 raise Exception(msg) from err
+
+        for model in _IMPORT_MODELS:
+            created = model.objects.bulk_create(objects[model], batch_size=batch_size)
+            if getattr(model, "audit_log", False):
+                # Imported here, since the audit log receivers are connected on import
+                from .log_signals import log
+
+                for instance in created:
+                    log("CREATE", instance)
         return result
 
 
@@ -252,6 +307,9 @@ class SensitiveData(SerializableMixin):
     def resolve_profile(self):
         return self.profile if self.pk else None
 
+    def resolve_profile_id(self):
+        return self.profile_id if self.pk else None
+
 
 class Contact(SerializableMixin):
     primary = models.BooleanField(default=False)
@@ -268,6 +326,10 @@ class Phone(Contact):
     phone_type = EnumField(
         PhoneType, max_length=32, blank=False, default=PhoneType.MOBILE
     )
+
+    class Meta:
+        indexes = [trigram_index("phone", "phone")]
+
     serialize_fields = (
         {"name": "primary"},
         {"name": "phone_type", "accessor": lambda x: getattr(x, "name")},
@@ -287,6 +349,7 @@ class Email(Contact):
 
     class Meta:
         ordering = ["-primary"]
+        indexes = [trigram_index("email", "email")]
 
     serialize_fields = (
         {"name": "primary"},
@@ -310,6 +373,14 @@ class Address(Contact):
     address_type = EnumField(
         AddressType, max_length=32, blank=False, default=AddressType.HOME
     )
+
+    class Meta:
+        indexes = [
+            trigram_index("address", "address"),
+            trigram_index("address", "postal_code"),
+            trigram_index("address", "city"),
+        ]
+
     serialize_fields = (
         {"name": "primary"},
         {"name": "address_type", "accessor": lambda x: getattr(x, "name")},
@@ -320,6 +391,110 @@ class Address(Contact):
     )
 
 
+class PrimaryContactInfo(models.Model):
+    """
+    Denormalized primary contact details of a profile, used for ordering profiles by them.
+
+    Every profile has exactly one row, created along with the profile and kept up to date
+    from the primary Email, Phone and Address of the profile by the signal receivers in
+    profiles.contact_signals.
+    """
+
+    profile = models.OneToOneField(
+        Profile,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="primary_contact_info",
+    )
+    email = models.EmailField(max_length=254, null=True, db_index=True)
+    phone = models.CharField(max_length=255, null=True, db_index=True)
+    address = models.CharField(max_length=128, null=True, db_index=True)
+    postal_code = models.CharField(max_length=32, null=True, db_index=True)
+    city = models.CharField(max_length=64, null=True, db_index=True)
+    country_code = models.CharField(max_length=2, null=True, db_index=True)
+
+
+def _build_customer_objects(item, customer_index, berth_service):
+    """Build the unsaved objects of an imported customer, the profile first."""
+    profile = Profile(
+        first_name=item.get("first_name", ""), last_name=item.get("last_name", "")
+    )
+    customer_objects = [profile]
+    ssn = item.get("ssn")
+    if ssn:
+        customer_objects.append(SensitiveData(ssn=ssn, profile=profile))
+    email = item.get("email", None)
+    if not email:
+        raise ProfileMustHaveOnePrimaryEmail(
+            f"Profile must have exactly one primary email, index: {customer_index}"
+        )
+    customer_objects.append(
+        Email(profile=profile, email=email, email_type=EmailType.PERSONAL, primary=True)
+    )
+    primary_contact_info = PrimaryContactInfo(profile=profile, email=email)
+    address = item.get("address", None)
+    if address:
+        primary_address = Address(
+            profile=profile,
+            address=address.get("address", ""),
+            postal_code=address.get("postal_code", ""),
+            city=address.get("city", ""),
+            country_code="fi",
+            address_type=AddressType.HOME,
+            primary=True,
+        )
+        customer_objects.append(primary_address)
+        for field_name in ("address", "postal_code", "city", "country_code"):
+            setattr(
+                primary_contact_info, field_name, getattr(primary_address, field_name)
+            )
+    phones = item.get("phones", ())
+    for index, phone in enumerate(phones):
+        customer_objects.append(
+            Phone(
+                profile=profile,
+                phone=phone,
+                phone_type=PhoneType.MOBILE,
+                primary=index == 0,
+            )
+        )
+        if index == 0:
+            primary_contact_info.phone = phone
+    customer_objects.append(primary_contact_info)
+    if berth_service is None:
+        raise Service.DoesNotExist("Berth service does not exist")
+    customer_objects.append(
+        ServiceConnection(profile=profile, service=berth_service, enabled=False)
+    )
+    return customer_objects
+
+
+def _validate_import_object(obj):
+    """
+    Validate the field values of an imported object without querying the database.
+
+    Empty values are accepted as before, only the given values are validated.
+    """
+    exclude = [
+        field.name
+        for field in obj._meta.fields
+        if field.is_relation or getattr(obj, field.attname) in ("", None)
+    ]
+    obj.clean_fields(exclude=exclude)
+
+
+# Models created by the customer data import, in the order they are inserted
+_IMPORT_MODELS = (
+    Profile,
+    SensitiveData,
+    Email,
+    Address,
+    Phone,
+    PrimaryContactInfo,
+    ServiceConnection,
+)
+
+
 class ClaimToken(models.Model):
     profile = models.ForeignKey(
         Profile, related_name="claim_tokens", on_delete=models.CASCADE
@@ -328,3 +503,71 @@ class ClaimToken(models.Model):
         max_length=36, blank=True, default=uuid.uuid4, editable=False
     )
     expires_at = models.DateTimeField(null=True, blank=True)
+
+
+class ProfileImportJob(UUIDModel):
+    """
+    Import of customer data from an uploaded JSON file, run in the background.
+
+    The customers are imported in chunks, each saved in its own transaction together with
+    the job progress, so a failed job can be resumed from the first unsaved customer.
+    A pending or running job which hasn't saved any progress in PROFILE_IMPORT_STALE_TIMEOUT
+    seconds is considered interrupted, e.g. by a restart of the worker, and can be resumed
+    too. The uploaded file is deleted once the job completes or the job is deleted.
+    """
+
+    file = models.FileField(
+        upload_to="profile_imports/", storage=ProfileImportStorage()
+    )
+    chunk_size = models.PositiveIntegerField(default=1000)
+    status = EnumField(ImportJobStatus, max_length=16, default=ImportJobStatus.PENDING)
+    processed_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return "{} ({})".format(self.file.name, self.status.label)
+
+    @staticmethod
+    def get_stale_time():
+        """Unfinished jobs last saved before the returned time are considered interrupted."""
+        return timezone.now() - timedelta(seconds=settings.PROFILE_IMPORT_STALE_TIMEOUT)
+
+    @classmethod
+    def get_resumable_filter(cls):
+        return models.Q(status=ImportJobStatus.FAILED) | models.Q(
+            status__in=(ImportJobStatus.PENDING, ImportJobStatus.RUNNING),
+            updated_at__lt=cls.get_stale_time(),
+        )
+
+    @property
+    def is_resumable(self):
+        return self.status == ImportJobStatus.FAILED or (
+            self.status in (ImportJobStatus.PENDING, ImportJobStatus.RUNNING)
+            and self.updated_at < self.get_stale_time()
+        )
+
+    def delete_file(self):
+        """Delete the uploaded file from the storage, keeping its name for reference."""
+        if self.file:
+            self.file.storage.delete(self.file.name)
+
+    def iter_result(self):
+        """Yield the (customer_id, profile id) pairs of the imported customers."""
+        mappings = self.mappings.order_by("pk").values_list("customer_id", "profile_id")
+        for customer_id, profile_id in mappings.iterator():
+            yield customer_id, str(profile_id)
+
+
+class ProfileImportMapping(models.Model):
+    """The profile created by an import job for a customer of the imported file"""
+
+    job = models.ForeignKey(
+        ProfileImportJob, related_name="mappings", on_delete=models.CASCADE
+    )
+    customer_id = models.CharField(max_length=255)
+    profile_id = models.UUIDField()
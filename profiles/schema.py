@@ -1,11 +1,15 @@
+import time
+from collections import defaultdict
 from itertools import chain
 
 import graphene
 import requests
 from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
-from django.db.models import OuterRef, Subquery
+from django.db.models import Exists, OuterRef, Prefetch, Q, QuerySet, Subquery
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.utils.translation import override
 from django.utils.translation import ugettext_lazy as _
@@ -16,8 +20,8 @@ from django_filters import (
     FilterSet,
     OrderingFilter,
 )
+from django_filters.constants import EMPTY_VALUES
 from graphene import relay
-from graphene.utils.str_converters import to_snake_case
 from graphene_django.filter import DjangoFilterConnectionField
 from graphene_django.types import DjangoObjectType
 from graphene_federation import key
@@ -36,12 +40,16 @@ from open_city_profile.exceptions import (
 from profiles.decorators import staff_required
 from services.exceptions import MissingGDPRUrlException
 from services.models import Service, ServiceConnection
+from services.registry import get_service
 from services.schema import AllowedServiceType, ServiceConnectionType
+from services.utils import call_for_service_connections
+from subscriptions.models import Subscription
 from subscriptions.schema import (
     SubscriptionInputType,
     SubscriptionNode,
     UpdateMySubscriptionMutation,
 )
+from utils.pagination import KeysetFilterConnectionField
 from youths.schema import (
     CreateMyYouthProfileMutation,
     CreateYouthProfileMutation,
@@ -51,13 +59,23 @@ from youths.schema import (
     YouthProfileType,
 )
 
+from .counting import count_profiles
 from .enums import AddressType, EmailType, PhoneType
+from .loaders import (
+    get_loader,
+    PrimaryAddressLoader,
+    PrimaryEmailLoader,
+    PrimaryPhoneLoader,
+    ProfileReferenceLoader,
+    SensitiveDataLoader,
+)
 from .models import Address, ClaimToken, Contact, Email, Phone, Profile, SensitiveData
 from .utils import (
     create_nested,
     delete_nested,
+    get_selected_field_names,
+    get_service_permissions,
     update_nested,
-    user_has_staff_perms_to_view_profile,
 )
 
 AllowedEmailType = graphene.Enum.from_enum(
@@ -164,6 +182,93 @@ with override("en"):
     )
 
 
+# Prefetches applied to a profile queryset when the related field is selected in the query
+PROFILE_PREFETCHES = {
+    "emails": ("emails",),
+    "phones": ("phones",),
+    "addresses": ("addresses",),
+    "serviceConnections": (
+        Prefetch(
+            "service_connections",
+            queryset=ServiceConnection.objects.select_related("service"),
+        ),
+    ),
+    "subscriptions": (
+        Prefetch(
+            "subscriptions",
+            queryset=Subscription.objects.select_related("subscription_type"),
+        ),
+    ),
+}
+
+
+def prefetch_profile_relations(queryset, selected_fields):
+    """Apply the prefetches matching the selected ProfileNode fields to the queryset"""
+    lookups = [
+        lookup
+        for field_name in selected_fields
+        for lookup in PROFILE_PREFETCHES.get(field_name, ())
+    ]
+    return queryset.prefetch_related(*lookups) if lookups else queryset
+
+
+def search_profiles(queryset, search):
+    """Filter the profiles to the ones with a name, nickname or email similar to the search
+
+    The profiles are ordered by the best trigram similarity of these fields. The similarity
+    lookups use the trigram indexes of the fields. Matching emails are looked up once for
+    all profiles, and their similarity is computed only for the matching profiles.
+    """
+    matching_emails = Email.objects.filter(email__trigram_similar=search)
+    email_similarity = Subquery(
+        matching_emails.filter(profile=OuterRef("pk"))
+        .annotate(similarity=TrigramSimilarity("email", search))
+        .order_by("-similarity")
+        .values("similarity")[:1]
+    )
+    return (
+        queryset.filter(
+            Q(first_name__trigram_similar=search)
+            | Q(last_name__trigram_similar=search)
+            | Q(nickname__trigram_similar=search)
+            | Q(pk__in=matching_emails.values("profile_id"))
+        )
+        .annotate(
+            # NULL email similarity is ignored by GREATEST in PostgreSQL
+            search_rank=Greatest(
+                TrigramSimilarity("first_name", search),
+                TrigramSimilarity("last_name", search),
+                TrigramSimilarity("nickname", search),
+                email_similarity,
+            )
+        )
+        .order_by("-search_rank", "pk")
+    )
+
+
+class PrefetchAwareFilterConnectionField(DjangoFilterConnectionField):
+    """Filter connection field which serves the results from the prefetch cache
+
+    If the resolver returns an already evaluated queryset (e.g. the related manager of a prefetched
+    relation) and no filtering is requested, the queryset is used as is instead of letting the
+    filterset clone it into a new query.
+    """
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        if (
+            isinstance(iterable, QuerySet)
+            and iterable._result_cache is not None
+            and not any(arg in filtering_args for arg in args)
+        ):
+            return iterable
+        return super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+
+
 class ProfilesConnection(graphene.Connection):
     class Meta:
         abstract = True
@@ -172,10 +277,18 @@ class ProfilesConnection(graphene.Connection):
     total_count = graphene.Int(required=True)
 
     def resolve_count(self, info):
-        return self.length
+        # the pages are read without counting the rows, unless an offset page is read
+        # from the end
+        length = getattr(self, "length", None)
+        return count_profiles(self.iterable) if length is None else length
 
     def resolve_total_count(self, info, **kwargs):
-        return self.iterable.model.objects.count()
+        # all the profiles of the service, without the filters
+        return count_profiles(
+            self.iterable.model.objects.filter(
+                service_connections__service__service_type=info.context.service_type
+            )
+        )
 
 
 class PrimaryContactInfoOrderingFilter(OrderingFilter):
@@ -187,15 +300,14 @@ class PrimaryContactInfoOrderingFilter(OrderingFilter):
     # custom field definitions:
     # 0. custom field name (camel case format)
     # 1. field display text
-    # 2. model with foreign key profile_id
-    # 3. field name of the related model
+    # 2. field of the denormalized PrimaryContactInfo of the profile
 
     FIELDS = (
-        ("primaryCity", "Primary City", Address, "city"),
-        ("primaryPostalCode", "Primary Postal Code", Address, "postal_code"),
-        ("primaryAddress", "Primary Address", Address, "address"),
-        ("primaryCountryCode", "Primary Country Code", Address, "country_code"),
-        ("primaryEmail", "Primary Email", Email, "email"),
+        ("primaryCity", "Primary City", "city"),
+        ("primaryPostalCode", "Primary Postal Code", "postal_code"),
+        ("primaryAddress", "Primary Address", "address"),
+        ("primaryCountryCode", "Primary Country Code", "country_code"),
+        ("primaryEmail", "Primary Email", "email"),
     )
 
     def __init__(self, *args, **kwargs):
@@ -222,15 +334,13 @@ class PrimaryContactInfoOrderingFilter(OrderingFilter):
                 # get rid of leading "-" if ordering is descending
                 field_name = value.replace("-", "")
                 field_data = _get_field_data_by_field(self.FIELDS, field_name)
-                # annotate the query with extra field and return the queryset
-                annotation = {
-                    to_snake_case(field_name): Subquery(
-                        field_data[2]
-                        .objects.filter(profile_id=OuterRef("id"), primary=True)
-                        .values(field_data[3])
-                    )
-                }
-                return qs.annotate(**annotation).order_by(to_snake_case(value))
+                # order by the indexed column of the joined primary contact info.
+                # Every profile has one, so the filter only turns the join into an
+                # inner join, which lets the index drive the ordering.
+                descending = "-" if value.startswith("-") else ""
+                return qs.filter(primary_contact_info__isnull=False).order_by(
+                    f"{descending}primary_contact_info__{field_data[2]}"
+                )
         return super().filter(qs, values)
 
 
@@ -258,20 +368,20 @@ class ProfileFilter(FilterSet):
             "enabled_subscriptions",
         )
 
-    first_name = CharFilter(lookup_expr="icontains")
-    last_name = CharFilter(lookup_expr="icontains")
-    nickname = CharFilter(lookup_expr="icontains")
-    emails__email = CharFilter(lookup_expr="icontains")
+    first_name = CharFilter(lookup_expr="ilike_contains")
+    last_name = CharFilter(lookup_expr="ilike_contains")
+    nickname = CharFilter(lookup_expr="ilike_contains")
+    emails__email = CharFilter(lookup_expr="ilike_contains")
     emails__email_type = ChoiceFilter(choices=EmailType.choices())
     emails__primary = BooleanFilter()
     emails__verified = BooleanFilter()
-    phones__phone = CharFilter(lookup_expr="icontains")
+    phones__phone = CharFilter(lookup_expr="ilike_contains")
     phones__phone_type = ChoiceFilter(choices=PhoneType.choices())
     phones__primary = BooleanFilter()
-    addresses__address = CharFilter(lookup_expr="icontains")
-    addresses__postal_code = CharFilter(lookup_expr="icontains")
-    addresses__city = CharFilter(lookup_expr="icontains")
-    addresses__country_code = CharFilter(lookup_expr="icontains")
+    addresses__address = CharFilter(lookup_expr="ilike_contains")
+    addresses__postal_code = CharFilter(lookup_expr="ilike_contains")
+    addresses__city = CharFilter(lookup_expr="ilike_contains")
+    addresses__country_code = CharFilter(lookup_expr="ilike_contains")
     addresses__address_type = ChoiceFilter(choices=AddressType.choices())
     addresses__primary = BooleanFilter()
     language = CharFilter()
@@ -289,10 +399,52 @@ class ProfileFilter(FilterSet):
         """
         Custom filter to join the enabled of subscription with subscription type correctly
         """
-        return queryset.filter(
-            subscriptions__enabled=True, subscriptions__subscription_type__code=value
+        return self.filter_related(
+            queryset,
+            "subscriptions",
+            {"enabled": True, "subscription_type__code": value},
+        )
+
+    @staticmethod
+    def filter_related(queryset, relation, conditions):
+        """Filter the profiles to the ones with a related object matching all the conditions
+
+        The conditions are checked with an EXISTS subquery instead of joining the related
+        table, so the profiles are not duplicated and the indexes of the related table can
+        be used.
+        """
+        field = queryset.model._meta.get_field(relation)
+        related = field.related_model._default_manager.filter(
+            **{field.field.name: OuterRef("pk")}, **conditions
+        )
+        annotation = f"has_{relation}_{len(queryset.query.annotations)}"
+        return queryset.annotate(**{annotation: Exists(related)}).filter(
+            **{annotation: True}
         )
 
+    def filter_queryset(self, queryset):
+        # the filters of each multi-valued relation are combined into one EXISTS subquery
+        related_conditions = defaultdict(dict)
+        for name, value in self.form.cleaned_data.items():
+            filter_ = self.filters[name]
+            relation, _, field_name = filter_.field_name.partition("__")
+            if (
+                field_name
+                and value not in EMPTY_VALUES
+                and value != getattr(filter_, "null_value", None)
+                and not filter_.method
+                and not filter_.exclude
+                and self._meta.model._meta.get_field(relation).one_to_many
+            ):
+                lookup = f"{field_name}__{filter_.lookup_expr}"
+                related_conditions[relation][lookup] = value
+            else:
+                queryset = filter_.filter(queryset, value)
+
+        for relation, conditions in related_conditions.items():
+            queryset = self.filter_related(queryset, relation, conditions)
+        return queryset
+
 
 class ContactNode(DjangoObjectType):
     class Meta:
@@ -372,13 +524,13 @@ class ProfileNode(DjangoObjectType):
         AddressNode,
         description="Convenience field for the address which is marked as primary.",
     )
-    emails = DjangoFilterConnectionField(
+    emails = PrefetchAwareFilterConnectionField(
         EmailNode, description="List of email addresses of the profile."
     )
-    phones = DjangoFilterConnectionField(
+    phones = PrefetchAwareFilterConnectionField(
         PhoneNode, description="List of phone numbers of the profile."
     )
-    addresses = DjangoFilterConnectionField(
+    addresses = PrefetchAwareFilterConnectionField(
         AddressNode, description="List of addresses of the profile."
     )
     sensitivedata = graphene.Field(
@@ -387,64 +539,74 @@ class ProfileNode(DjangoObjectType):
     )
     language = Language()
     contact_method = ContactMethod()
-    service_connections = DjangoFilterConnectionField(
+    service_connections = PrefetchAwareFilterConnectionField(
         ServiceConnectionType, description="List of the profile's connected services."
     )
     youth_profile = graphene.Field(
         YouthProfileType, description="The Youth membership data of the profile."
     )
-    subscriptions = DjangoFilterConnectionField(SubscriptionNode)
+    subscriptions = PrefetchAwareFilterConnectionField(SubscriptionNode)
 
     def resolve_service_connections(self, info, **kwargs):
-        return ServiceConnection.objects.filter(profile=self)
+        return self.service_connections.all()
+
+    def resolve_subscriptions(self, info, **kwargs):
+        return self.subscriptions.all()
 
     def resolve_primary_email(self, info, **kwargs):
-        return Email.objects.filter(profile=self, primary=True).first()
+        return get_loader(info.context, PrimaryEmailLoader).load(self.pk)
 
     def resolve_primary_phone(self, info, **kwargs):
-        return Phone.objects.filter(profile=self, primary=True).first()
+        return get_loader(info.context, PrimaryPhoneLoader).load(self.pk)
 
     def resolve_primary_address(self, info, **kwargs):
-        return Address.objects.filter(profile=self, primary=True).first()
+        return get_loader(info.context, PrimaryAddressLoader).load(self.pk)
 
     def resolve_emails(self, info, **kwargs):
-        return Email.objects.filter(profile=self)
+        return self.emails.all()
 
     def resolve_phones(self, info, **kwargs):
-        return Phone.objects.filter(profile=self)
+        return self.phones.all()
 
     def resolve_addresses(self, info, **kwargs):
-        return Address.objects.filter(profile=self)
+        return self.addresses.all()
 
     def resolve_sensitivedata(self, info, **kwargs):
-        service = (
-            Service.objects.filter(service_type=info.context.service_type).first()
-            if hasattr(info.context, "service_type")
-            else None
-        )
-        if (
-            not service and info.context.user == self.user
-        ) or info.context.user.has_perm("can_view_sensitivedata", service):
-            return self.sensitivedata
+        # the service and the permissions are looked up once per request
+        user = info.context.user
+        permissions = get_service_permissions(info.context)
+        try:
+            service = (
+                permissions.get_service(info.context.service_type)
+                if hasattr(info.context, "service_type")
+                else None
+            )
+        except Service.DoesNotExist:
+            service = None
+        if service:
+            allowed = permissions.has_perm("can_view_sensitivedata", service)
+        else:
+            allowed = (user.is_active and user.is_superuser) or (
+                user.is_authenticated and self.user_id == user.pk
+            )
+
+        if allowed:
+            return get_loader(info.context, SensitiveDataLoader).load(self.pk)
         else:
             # TODO: We should return PermissionDenied as a partial error here.
             return None
 
     @login_required
     def __resolve_reference(self, info, **kwargs):
-        profile = graphene.Node.get_node_from_global_id(
-            info, self.id, only_type=ProfileNode
-        )
-        if not profile:
+        try:
+            node_type, profile_id = relay.Node.from_global_id(self.id)
+        except Exception:
             return None
+        assert node_type == ProfileNode._meta.name, "Must receive a ProfileNode id."
 
+        # the references of an _entities query are loaded and permission checked together
         user = info.context.user
-        if user == profile.user or user_has_staff_perms_to_view_profile(user, profile):
-            return profile
-        else:
-            raise PermissionDenied(
-                _("You do not have permission to perform this action.")
-            )
+        return get_loader(info.context, ProfileReferenceLoader, user).load(profile_id)
 
 
 class EmailInput(graphene.InputObjectType):
@@ -581,7 +743,7 @@ class CreateProfileMutation(relay.ClientIDMutation):
     @staff_required(required_permission="manage")
     @transaction.atomic
     def mutate_and_get_payload(cls, root, info, **input):
-        service = Service.objects.get(service_type=input["service_type"])
+        service = get_service(input["service_type"])
         # serviceType passed on to the sub resolvers
         info.context.service_type = input["service_type"]
         profile_data = input.pop("profile")
@@ -672,7 +834,7 @@ class UpdateProfileMutation(relay.ClientIDMutation):
     @staff_required(required_permission="manage")
     @transaction.atomic
     def mutate_and_get_payload(cls, root, info, **input):
-        service = Service.objects.get(service_type=input["service_type"])
+        service = get_service(input["service_type"])
         # serviceType passed on to the sub resolvers
         info.context.service_type = input["service_type"]
         profile_data = input.get("profile")
@@ -758,16 +920,34 @@ class DeleteMyProfileMutation(relay.ClientIDMutation):
 
     @staticmethod
     def delete_service_connections_for_profile(profile, dry_run=False):
+        """Delete the GDPR data of the profile from all the connected services concurrently.
+
+        Both the dry run and the deletion have their own GDPR_API_DEADLINE. The deletions
+        are all sent at once and waited for even if the deadline is exceeded, so that no
+        service deletes the data without the profile being deleted too, and no deletion is
+        left unsent after a successful dry run.
+        """
         failed_services = []
 
-        for service_connection in profile.service_connections.all():
-            try:
-                service_connection.delete_gdpr_data(dry_run=dry_run)
+        deadline = time.monotonic() + settings.GDPR_API_DEADLINE
+        results = call_for_service_connections(
+            profile.service_connections.select_related("service"),
+            lambda service_connection: service_connection.delete_gdpr_data(
+                dry_run=dry_run, deadline=deadline
+            ),
+            wait_for_all=not dry_run,
+        )
+        for service_connection, result, error in results:
+            if error is None:
                 if not dry_run:
                     service_connection.delete()
-            except (requests.RequestException, MissingGDPRUrlException):
+            elif isinstance(
+                error, (requests.RequestException, MissingGDPRUrlException)
+            ):
                 service_name = service_connection.service.service_type.name
                 failed_services.append(service_name)
+            else:
+                raise error
 
         if failed_services:
             failed_services_string = ", ".join(failed_services)
@@ -811,13 +991,19 @@ class Query(graphene.ObjectType):
         "authentication.\n\nPossible error codes:\n\n* `TODO`",
     )
     # TODO: Add the complete list of error codes
-    profiles = DjangoFilterConnectionField(
+    profiles = KeysetFilterConnectionField(
         ProfileNode,
         service_type=graphene.Argument(AllowedServiceType, required=True),
+        search=graphene.String(
+            description="Search for profiles with a first name, last name, nickname or email similar to the "
+            "given text. The results are ordered by the similarity, unless `orderBy` is given."
+        ),
         description="Search for profiles. The results are filtered based on the given parameters. The results are "
         "paged using Relay.\n\nRequires `staff` credentials for the service given in "
         "`serviceType`. The profiles must have an active connection to the given `serviceType`, otherwise "
-        "they will not be returned.\n\nPossible error codes:\n\n* `TODO`",
+        "they will not be returned.\n\nThe results are ordered by `orderBy`, or by the similarity when "
+        "`search` is given, and by the first name otherwise. A cursor is only valid in the ordering of the "
+        "page it was returned on.\n\nPossible error codes:\n\n* `INVALID_CURSOR_ERROR`\n* `TODO`",
     )
     # TODO: Add the complete list of error codes
     claimable_profile = graphene.Field(
@@ -830,7 +1016,7 @@ class Query(graphene.ObjectType):
 
     @staff_required(required_permission="view")
     def resolve_profile(self, info, **kwargs):
-        service = Service.objects.get(service_type=kwargs["service_type"])
+        service = get_service(kwargs["service_type"])
         # serviceType passed on to the sub resolvers
         info.context.service_type = kwargs["service_type"]
         return Profile.objects.filter(service_connections__service=service).get(
@@ -845,9 +1031,17 @@ class Query(graphene.ObjectType):
     def resolve_profiles(self, info, **kwargs):
         # serviceType passed on to the sub resolvers
         info.context.service_type = kwargs["service_type"]
-        return Profile.objects.filter(
+        queryset = Profile.objects.filter(
             service_connections__service__service_type=kwargs["service_type"]
         )
+        if kwargs.get("search"):
+            queryset = search_profiles(queryset, kwargs["search"])
+        else:
+            # a stable default for the keyset pages, replaced by orderBy
+            queryset = queryset.order_by("first_name", "pk")
+        return prefetch_profile_relations(
+            queryset, get_selected_field_names(info, ("edges", "node"))
+        )
 
     @login_required
     def resolve_claimable_profile(self, info, **kwargs):
@@ -856,7 +1050,9 @@ class Query(graphene.ObjectType):
 
     @login_required
     def resolve_download_my_profile(self, info, **kwargs):
-        profile = Profile.objects.filter(user=info.context.user).first()
+        profile = (
+            Profile.objects.for_serialization().filter(user=info.context.user).first()
+        )
         return {
             "key": "DATA",
             "children": [
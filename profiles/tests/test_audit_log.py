@@ -0,0 +1,83 @@
+import io
+import logging
+import threading
+
+import pytest
+
+from profiles.audit_log import QueuedAuditLogHandler
+
+
+def create_record(message):
+    return logging.LogRecord("audit", logging.INFO, __file__, 1, message, None, None)
+
+
+def test_queued_audit_log_handler_writes_records_to_file(tmp_path):
+    filename = str(tmp_path / "audit.log")
+    handler = QueuedAuditLogHandler(sink="file", filename=filename, batch_size=2)
+
+    for i in range(5):
+        handler.handle(create_record(f"message {i}"))
+    handler.close()
+
+    with open(filename) as f:
+        assert f.read().splitlines() == [f"message {i}" for i in range(5)]
+    assert handler.get_metrics() == {
+        "queue_depth": 0,
+        "queue_size": 10000,
+        "dropped_count": 0,
+        "written_count": 5,
+    }
+
+
+def test_queued_audit_log_handler_drops_records_when_queue_is_full():
+    written = []
+    release_writer = threading.Event()
+
+    class BlockingStream:
+        def write(self, data):
+            release_writer.wait(timeout=5)
+            written.extend(data.splitlines())
+
+        def flush(self):
+            pass
+
+    handler = QueuedAuditLogHandler(queue_size=1, batch_size=1, put_timeout=0)
+    handler.stream = BlockingStream()
+
+    for i in range(5):
+        handler.handle(create_record(f"message {i}"))
+    release_writer.set()
+    handler.close()
+
+    assert handler.dropped_count >= 3
+    assert len(written) == 5 - handler.dropped_count
+    assert handler.written_count == len(written)
+
+
+def test_queued_audit_log_handler_requires_filename_for_file_sink():
+    with pytest.raises(ValueError):
+        QueuedAuditLogHandler(sink="file")
+
+
+def test_queued_audit_log_handler_logs_its_metrics_periodically(caplog):
+    caplog.set_level(logging.INFO, logger="profiles.audit_log")
+    logged = threading.Event()
+
+    class MetricsHandler(logging.Handler):
+        def emit(self, record):
+            if record.getMessage().startswith("Audit log queue"):
+                logged.set()
+
+    metrics_handler = MetricsHandler()
+    logging.getLogger("profiles.audit_log").addHandler(metrics_handler)
+    handler = QueuedAuditLogHandler(metrics_interval=0.05)
+    handler.stream = io.StringIO()
+    try:
+        handler.handle(create_record("message"))
+        assert logged.wait(timeout=5)
+    finally:
+        handler.close()
+        logging.getLogger("profiles.audit_log").removeHandler(metrics_handler)
+
+    handler.log_metrics()
+    assert "Audit log queue: 0/10000 queued, 0 dropped, 1 written" in caplog.text
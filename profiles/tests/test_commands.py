@@ -0,0 +1,110 @@
+import csv
+import gzip
+import json
+
+from django.core.management import call_command
+
+from services.enums import ServiceType
+from services.tests.factories import ServiceConnectionFactory
+
+from ..models import Profile
+from .factories import EmailFactory, ProfileFactory, ProfileWithPrimaryEmailFactory
+
+
+def test_export_profiles_as_ndjson(tmp_path):
+    profiles = ProfileWithPrimaryEmailFactory.create_batch(3)
+    output = tmp_path / "profiles.ndjson.gz"
+
+    call_command("export_profiles", str(output), gzip=True, chunk_size=2)
+
+    with gzip.open(str(output), "rt") as export:
+        exported = [json.loads(line) for line in export]
+    assert exported == [
+        profile.serialize() for profile in sorted(profiles, key=lambda p: p.pk)
+    ]
+
+
+def test_export_profiles_of_service_type_as_csv(tmp_path, service_factory):
+    berth_service = service_factory(service_type=ServiceType.BERTH)
+    youth_service = service_factory(service_type=ServiceType.YOUTH_MEMBERSHIP)
+    profile = ProfileFactory()
+    EmailFactory(profile=profile, primary=True)
+    ServiceConnectionFactory(profile=profile, service=berth_service)
+    ServiceConnectionFactory(profile=ProfileFactory(), service=youth_service)
+    output = tmp_path / "profiles.csv"
+
+    call_command("export_profiles", str(output), format="csv", service_type="BERTH")
+
+    with open(str(output), newline="") as export:
+        rows = list(csv.DictReader(export))
+    assert len(rows) == 1
+    assert rows[0]["id"] == str(profile.pk)
+    assert rows[0]["email"] == profile.get_primary_email_value()
+    assert rows[0]["service_types"] == "BERTH"
+
+
+def test_import_profiles_command_reports_failed_customers(service_factory, tmp_path):
+    service_factory()
+    input_file = tmp_path / "customers.csv"
+    input_file.write_text(
+        "customer_id,first_name,email,address,postal_code,city,phones\n"
+        "1,Jukka,jukka@example.com,Mannerheimintie 1,00100,Helsinki,0412345678;091234567\n"
+        "2,Mirja,,,,,\n"
+        "3,Matti,matti@example.com,,,,\n"
+    )
+    output = tmp_path / "profile_ids.json"
+    errors = tmp_path / "errors.json"
+
+    call_command(
+        "import_profiles",
+        str(input_file),
+        output=str(output),
+        errors=str(errors),
+        workers=1,
+        chunk_size=2,
+    )
+
+    profile_ids = json.loads(output.read_text())
+    assert set(profile_ids) == {"1", "3"}
+    assert (
+        Profile.objects.filter(pk=profile_ids["1"], phones__isnull=False).count() == 2
+    )
+    error_report = json.loads(errors.read_text())
+    assert [(error["index"], error["customer_id"]) for error in error_report] == [
+        (1, "2")
+    ]
+
+
+def test_import_profiles_command_imports_with_worker_processes(
+    transactional_db, service_factory, tmp_path
+):
+    """The workers see only committed data, so the test can't run in a transaction."""
+    service_factory()
+    customers = [
+        {"customer_id": str(i), "email": f"customer{i}@example.com"} for i in range(12)
+    ]
+    customers[3]["email"] = None
+    customers[8]["email"] = None
+    input_file = tmp_path / "customers.ndjson"
+    input_file.write_text("".join(json.dumps(c) + "\n" for c in customers))
+    output = tmp_path / "profile_ids.json"
+    errors = tmp_path / "errors.json"
+
+    # six chunks for two workers, which keep at most four chunks pending
+    call_command(
+        "import_profiles",
+        str(input_file),
+        output=str(output),
+        errors=str(errors),
+        workers=2,
+        chunk_size=2,
+    )
+
+    profile_ids = json.loads(output.read_text())
+    assert set(profile_ids) == {str(i) for i in range(12)} - {"3", "8"}
+    assert Profile.objects.count() == 10
+    error_report = json.loads(errors.read_text())
+    assert [(error["index"], error["customer_id"]) for error in error_report] == [
+        (3, "3"),
+        (8, "8"),
+    ]
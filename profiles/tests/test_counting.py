@@ -0,0 +1,58 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..counting import count_profiles
+from ..models import Profile
+from .factories import ProfileFactory
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.parametrize("threshold, exact", [(0, False), (10 ** 9, True)])
+def test_auto_count_mode_counts_exactly_below_threshold(settings, threshold, exact):
+    settings.PROFILE_COUNT_MODE = "auto"
+    settings.PROFILE_COUNT_ESTIMATE_THRESHOLD = threshold
+    ProfileFactory.create_batch(3)
+
+    with CaptureQueriesContext(connection) as context:
+        count = count_profiles(Profile.objects.all())
+
+    sql = [captured["sql"] for captured in context.captured_queries]
+    # the planner is always asked first, the rows are counted only below the threshold
+    assert sql[0].startswith("EXPLAIN")
+    assert any("COUNT(" in query.upper() for query in sql) == exact
+    if exact:
+        assert count == 3
+    else:
+        # the planner estimates at least one row, and the table statistics are not
+        # necessarily up to date with the new rows
+        assert isinstance(count, int)
+        assert 1 <= count <= 10 ** 4
+
+
+def test_estimated_count_uses_the_filters(settings):
+    settings.PROFILE_COUNT_MODE = "estimate"
+    ProfileFactory.create_batch(3)
+
+    assert count_profiles(Profile.objects.none()) == 0
+    assert count_profiles(Profile.objects.all()) >= count_profiles(
+        Profile.objects.filter(first_name="Nobody")
+    )
+
+
+def test_counts_are_cached_by_query(settings):
+    settings.PROFILE_COUNT_CACHE_TIMEOUT = 60
+    profile = ProfileFactory()
+
+    assert count_profiles(Profile.objects.all()) == 1
+    ProfileFactory()
+    assert count_profiles(Profile.objects.all()) == 1
+    assert count_profiles(Profile.objects.exclude(pk=profile.pk)) == 1
+    assert count_profiles(Profile.objects.filter(pk__isnull=False)) == 2
@@ -0,0 +1,142 @@
+import io
+import json
+import os
+
+import pytest
+from django.core.files.base import ContentFile
+
+from ..enums import ImportJobStatus
+from ..importer import (
+    _import_chunk,
+    ImportJobTakenOver,
+    iter_json_array,
+    run_import_job,
+)
+from ..models import Profile, ProfileImportJob
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.PROFILE_IMPORT_ROOT = str(tmp_path / "imports")
+
+
+def create_import_job(data, chunk_size):
+    return ProfileImportJob.objects.create(
+        file=ContentFile(json.dumps(data, indent=2).encode(), name="import.json"),
+        chunk_size=chunk_size,
+    )
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 64 * 1024])
+def test_iter_json_array_reads_items_one_by_one(read_size):
+    data = [{"customer_id": str(i), "phones": ["0412345678"] * i} for i in range(10)]
+
+    items = iter_json_array(io.StringIO(json.dumps(data, indent=2)), read_size)
+
+    assert list(items) == data
+
+
+@pytest.mark.parametrize("content", ["{}", "[{}", "[{} {}]", '[{"a": }]'])
+def test_iter_json_array_raises_on_invalid_json(content):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(content), read_size=2))
+
+
+def test_import_job_imports_customers_in_chunks(service_factory):
+    service_factory()
+    data = [
+        {"customer_id": str(i), "email": f"customer{i}@example.com"} for i in range(5)
+    ]
+    job = create_import_job(data, chunk_size=2)
+
+    run_import_job(job.pk)
+
+    job.refresh_from_db()
+    assert job.status == ImportJobStatus.COMPLETED
+    assert job.processed_count == 5
+    result = dict(job.iter_result())
+    assert set(result) == {str(i) for i in range(5)}
+    for customer_id, profile_id in result.items():
+        profile = Profile.objects.get(pk=profile_id)
+        assert profile.emails.get().email == f"customer{customer_id}@example.com"
+    assert Profile.objects.count() == 5
+    assert not job.file.storage.exists(job.file.name)
+
+
+def test_import_file_is_stored_privately_and_deleted_with_the_job(settings):
+    job = create_import_job([], chunk_size=2)
+    path = job.file.path
+
+    assert path.startswith(settings.PROFILE_IMPORT_ROOT)
+    assert os.path.exists(path)
+    with pytest.raises(ValueError):
+        job.file.url
+
+    job.delete()
+
+    assert not os.path.exists(path)
+
+
+def test_failed_import_job_can_be_resumed(service_factory):
+    service_factory()
+    data = [
+        {"customer_id": str(i), "email": f"customer{i}@example.com"} for i in range(5)
+    ]
+    data[3]["email"] = None
+    job = create_import_job(data, chunk_size=2)
+
+    run_import_job(job.pk)
+
+    job.refresh_from_db()
+    assert job.status == ImportJobStatus.FAILED
+    assert job.error == "Profile must have exactly one primary email, index: 3"
+    assert job.processed_count == 2
+    assert Profile.objects.count() == 2
+
+    data[3]["email"] = "customer3@example.com"
+    job.file.save("import.json", ContentFile(json.dumps(data).encode()))
+    run_import_job(job.pk)
+
+    job.refresh_from_db()
+    assert job.status == ImportJobStatus.COMPLETED
+    assert job.processed_count == 5
+    assert job.mappings.count() == 5
+    assert Profile.objects.count() == 5
+
+
+def test_interrupted_import_job_can_be_resumed(service_factory, settings):
+    service_factory()
+    data = [
+        {"customer_id": str(i), "email": f"customer{i}@example.com"} for i in range(3)
+    ]
+    job = create_import_job(data, chunk_size=2)
+    ProfileImportJob.objects.filter(pk=job.pk).update(status=ImportJobStatus.RUNNING)
+
+    run_import_job(job.pk)
+
+    job.refresh_from_db()
+    assert job.status == ImportJobStatus.RUNNING
+    assert not job.is_resumable
+    assert Profile.objects.count() == 0
+
+    settings.PROFILE_IMPORT_STALE_TIMEOUT = 0
+    job.refresh_from_db()
+    assert job.is_resumable
+
+    run_import_job(job.pk)
+
+    job.refresh_from_db()
+    assert job.status == ImportJobStatus.COMPLETED
+    assert Profile.objects.count() == 3
+
+
+def test_import_job_run_stops_when_another_run_has_taken_over(service_factory):
+    service_factory()
+    job = create_import_job([], chunk_size=2)
+    ProfileImportJob.objects.filter(pk=job.pk).update(processed_count=2)
+
+    with pytest.raises(ImportJobTakenOver):
+        _import_chunk(job, [{"customer_id": "1", "email": "customer1@example.com"}])
+
+    assert Profile.objects.count() == 0
@@ -4,7 +4,10 @@ import pytest
 from django.conf import settings
 from django.test.utils import patch_logger
 
+from profiles.log_signals import flush_audit_log_reads
 from profiles.models import Profile
+from profiles.utils import start_collecting_audit_log_reads
+from users.models import User
 
 from .factories import ProfileFactory
 
@@ -79,3 +82,31 @@ def test_audit_log_create(user, enable_audit_log, enable_audit_log_username):
             "profile_id": str(profile.pk),
             "profile_part": "base profile",
         }
+
+
+def test_audit_log_reads_are_collected_and_logged_once_per_profile(
+    user, enable_audit_log
+):
+    profile = ProfileFactory()
+    start_collecting_audit_log_reads()
+    with patch_logger("audit", "info") as cm:
+        Profile.objects.get(pk=profile.pk)
+        list(Profile.objects.filter(pk=profile.pk))
+        assert len(cm) == 0
+
+        flush_audit_log_reads()
+        assert len(cm) == 1
+        log_message = json.loads(cm[0])
+        assert_common_fields(log_message)
+        assert log_message["audit_event"]["operation"] == "READ"
+        assert log_message["audit_event"]["target"] == {
+            "user_id": str(profile.user.uuid),
+            "profile_id": str(profile.pk),
+            "profile_part": "base profile",
+        }
+
+
+def test_audit_log_is_not_written_for_non_audited_models(user, enable_audit_log):
+    with patch_logger("audit", "info") as cm:
+        User.objects.get(pk=user.pk)
+        assert len(cm) == 0
@@ -1,7 +1,11 @@
+import threading
+
 import pytest
 import requests
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from open_city_profile.exceptions import ProfileMustHaveOnePrimaryEmail
 from services.enums import ServiceType
@@ -9,9 +13,10 @@ from services.exceptions import MissingGDPRUrlException
 from services.models import ServiceConnection
 from services.tests.factories import ServiceConnectionFactory
 
-from ..models import Email, Profile
+from ..models import Email, PrimaryContactInfo, Profile
 from ..schema import validate_primary_email
 from .factories import (
+    AddressFactory,
     EmailFactory,
     ProfileWithPrimaryEmailFactory,
     SensitiveDataFactory,
@@ -89,7 +94,7 @@ def test_serialize_profile(profile):
 
 
 def test_get_service_gdpr_data(monkeypatch, service_factory, profile):
-    def mock_download_gdpr_data(self):
+    def mock_download_gdpr_data(self, deadline=None):
         if self.service.service_type == ServiceType.BERTH:
             return {"key": "BERTH", "children": [{"key": "CUSTOMERID", "value": "123"}]}
         elif self.service.service_type == ServiceType.YOUTH_MEMBERSHIP:
@@ -123,6 +128,67 @@ def test_get_service_gdpr_data(monkeypatch, service_factory, profile):
     ]
 
 
+def test_get_service_gdpr_data_skips_services_exceeding_deadline(
+    monkeypatch, settings, service_factory, profile
+):
+    release_slow_service = threading.Event()
+    youth_data = {
+        "key": "YOUTHPROFILE",
+        "children": [{"key": "BIRTH_DATE", "value": "2004-12-08"}],
+    }
+
+    def mock_download_gdpr_data(self, deadline=None):
+        if self.service.service_type == ServiceType.BERTH:
+            release_slow_service.wait(timeout=5)
+            return {"key": "BERTH", "children": []}
+        return youth_data
+
+    settings.GDPR_API_DEADLINE = 0.1
+    service_berth = service_factory(service_type=ServiceType.BERTH)
+    service_youth = service_factory(service_type=ServiceType.YOUTH_MEMBERSHIP)
+    ServiceConnectionFactory(profile=profile, service=service_berth)
+    ServiceConnectionFactory(profile=profile, service=service_youth)
+    monkeypatch.setattr(
+        ServiceConnection, "download_gdpr_data", mock_download_gdpr_data
+    )
+
+    try:
+        response = profile.get_service_gdpr_data()
+    finally:
+        release_slow_service.set()
+
+    assert response == [youth_data]
+
+
+def test_get_service_gdpr_data_reports_failing_services(
+    requests_mock, caplog, service_factory, profile
+):
+    youth_data = {
+        "key": "YOUTHPROFILE",
+        "children": [{"key": "BIRTH_DATE", "value": "2004-12-08"}],
+    }
+    service_berth = service_factory(
+        service_type=ServiceType.BERTH, gdpr_url="http://berth.example.com/profiles/"
+    )
+    service_youth = service_factory(
+        service_type=ServiceType.YOUTH_MEMBERSHIP,
+        gdpr_url="http://youth.example.com/profiles/",
+    )
+    ServiceConnectionFactory(profile=profile, service=service_berth)
+    ServiceConnectionFactory(profile=profile, service=service_youth)
+    requests_mock.get(
+        f"http://berth.example.com/profiles/{profile.pk}", status_code=404
+    )
+    requests_mock.get(
+        f"http://youth.example.com/profiles/{profile.pk}", json=youth_data
+    )
+
+    response = profile.get_service_gdpr_data()
+
+    assert [item.json() for item in response] == [youth_data]
+    assert "Downloading GDPR data from service BERTH failed" in caplog.text
+
+
 def test_remove_service_gdpr_data_no_url(profile, service):
     service_connection = ServiceConnectionFactory(profile=profile, service=service)
 
@@ -248,6 +314,80 @@ def test_import_customer_data_with_missing_email():
     assert Profile.objects.count() == 0
 
 
+def test_import_customer_data_queries_do_not_depend_on_data_set_size(service_factory):
+    service_factory()
+
+    def import_customers(count, offset):
+        data = [
+            {
+                "customer_id": str(offset + index),
+                "ssn": "010190-001A",
+                "email": f"customer{offset + index}@example.com",
+                "address": {
+                    "address": "Mannerheimintie 1 A 11",
+                    "postal_code": "00100",
+                    "city": "Helsinki",
+                },
+                "phones": ["0412345678", "358 503334411"],
+            }
+            for index in range(count)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            result = Profile.import_customer_data(data)
+        assert len(result) == count
+        return len(context.captured_queries)
+
+    assert import_customers(1, 0) == import_customers(20, 100)
+    assert Profile.objects.count() == 21
+    assert Email.objects.filter(primary=True).count() == 21
+    assert ServiceConnection.objects.filter(enabled=False).count() == 21
+
+
+def test_import_customer_data_validates_the_whole_data_set_before_saving(
+    service_factory,
+):
+    service_factory()
+    data = [
+        {"customer_id": "321456", "email": "jukka.virtanen@example.com"},
+        {"customer_id": "321457", "email": "not an email"},
+    ]
+
+    with pytest.raises(Exception) as e:
+        Profile.import_customer_data(data)
+    assert str(e.value) == "Could not import customer_id: 321457, index: 1"
+    assert isinstance(e.value.__cause__, ValidationError)
+    assert Profile.objects.count() == 0
+
+
+def test_primary_contact_info_is_created_with_the_profile(profile):
+    info = PrimaryContactInfo.objects.get(profile=profile)
+    assert (info.email, info.phone, info.address) == (None, None, None)
+
+
+def test_primary_contact_info_follows_primary_contacts(profile):
+    email = EmailFactory(profile=profile, primary=True)
+    address = AddressFactory(profile=profile, primary=True)
+
+    info = PrimaryContactInfo.objects.get(profile=profile)
+    assert info.email == email.email
+    assert (info.city, info.postal_code) == (address.city, address.postal_code)
+    assert info.phone is None
+
+    other_email = EmailFactory(profile=profile, primary=False)
+    email.primary = False
+    email.save()
+    other_email.primary = True
+    other_email.save()
+    address.delete()
+
+    info.refresh_from_db()
+    assert info.email == other_email.email
+    assert info.city is None
+
+    profile.delete()
+    assert not PrimaryContactInfo.objects.exists()
+
+
 def test_validation_should_pass_with_one_primary_email():
     profile = ProfileWithPrimaryEmailFactory()
     validate_primary_email(profile)
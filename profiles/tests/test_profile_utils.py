@@ -1,10 +1,18 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from guardian.shortcuts import assign_perm
 
 from services.enums import ServiceType
+from services.models import Service
 from services.tests.factories import ServiceConnectionFactory
 
-from ..utils import user_has_staff_perms_to_view_profile
+from ..utils import (
+    get_profiles_visible_to_staff,
+    get_service_permissions,
+    user_has_staff_perms_to_view_profile,
+)
+from .factories import ProfileFactory
 
 
 @pytest.mark.parametrize("user_should_have_perms", [True, False])
@@ -22,3 +30,55 @@ def test_user_has_admin_perms_to_view_profile_util(
     else:
         ServiceConnectionFactory(profile=profile, service=service_2)
         assert not user_has_staff_perms_to_view_profile(user, profile)
+
+
+def test_profiles_visible_to_staff_are_checked_in_one_query(
+    user, group, service_factory
+):
+    berth_service = service_factory(service_type=ServiceType.BERTH)
+    youth_service = service_factory(service_type=ServiceType.YOUTH_MEMBERSHIP)
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, berth_service)
+    berth_profiles = ProfileFactory.create_batch(3)
+    for profile in berth_profiles:
+        ServiceConnectionFactory(profile=profile, service=berth_service)
+    youth_profile, disabled_profile, unconnected_profile = ProfileFactory.create_batch(3)
+    ServiceConnectionFactory(profile=youth_profile, service=youth_service)
+    ServiceConnectionFactory(
+        profile=disabled_profile, service=berth_service, enabled=False
+    )
+
+    with CaptureQueriesContext(connection) as context:
+        visible = get_profiles_visible_to_staff(
+            user,
+            berth_profiles + [youth_profile, disabled_profile, unconnected_profile],
+        )
+
+    assert visible == {profile.pk for profile in berth_profiles}
+    assert len(context.captured_queries) == 1
+
+
+def test_service_permissions_are_loaded_once_per_request(
+    rf, user, group, service_factory
+):
+    berth_service = service_factory(service_type=ServiceType.BERTH)
+    youth_service = service_factory(service_type=ServiceType.YOUTH_MEMBERSHIP)
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, berth_service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    permissions = get_service_permissions(request)
+    assert permissions.get_service(ServiceType.BERTH.value) == berth_service
+    with CaptureQueriesContext(connection) as context:
+        for i in range(2):
+            permissions = get_service_permissions(request)
+            service = permissions.get_service(ServiceType.YOUTH_MEMBERSHIP.value)
+            assert service == youth_service
+            assert permissions.has_perm("can_view_profiles", berth_service)
+            assert not permissions.has_perm("can_view_profiles", youth_service)
+            assert not permissions.has_perm("can_manage_profiles", berth_service)
+    assert len(context.captured_queries) == 0
+
+    with pytest.raises(Service.DoesNotExist):
+        permissions.get_service(ServiceType.HKI_MY_DATA.value)
@@ -2,6 +2,8 @@ from datetime import timedelta
 from string import Template
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from graphene import relay
@@ -10,6 +12,7 @@ from guardian.shortcuts import assign_perm
 
 from open_city_profile.consts import (
     API_NOT_IMPLEMENTED_ERROR,
+    INVALID_CURSOR_ERROR,
     INVALID_EMAIL_FORMAT_ERROR,
     OBJECT_DOES_NOT_EXIST_ERROR,
     PROFILE_MUST_HAVE_ONE_PRIMARY_EMAIL,
@@ -39,6 +42,36 @@ from .factories import (
 )
 
 
+def assert_query_count_constant(
+    rf, gql_client, query, create_profile, variables=None, count=5
+):
+    """
+    Asserts that the query runs as many database queries for many profiles as for one.
+
+    The query is executed after creating one profile with create_profile and again after
+    creating count profiles in total. variables can be a function returning the query
+    variables for the created profiles. Returns the result of the second execution.
+    """
+    profiles = []
+
+    def execute_query():
+        request = rf.post("/graphql")
+        request.user = gql_client.user
+        kwargs = {"variables": variables(profiles)} if variables else {}
+        with CaptureQueriesContext(connection) as context:
+            executed = gql_client.execute(query, context=request, **kwargs)
+        return executed, len(context.captured_queries)
+
+    profiles.append(create_profile())
+    executed, num_queries_for_one_profile = execute_query()
+    assert "errors" not in executed
+
+    profiles.extend(create_profile() for i in range(count - 1))
+    executed, num_queries_for_many_profiles = execute_query()
+    assert num_queries_for_many_profiles == num_queries_for_one_profile
+    return executed
+
+
 def test_normal_user_can_create_profile(rf, user_gql_client, email_data, profile_data):
     request = rf.post("/graphql")
     request.user = user_gql_client.user
@@ -1063,6 +1096,119 @@ def test_normal_user_can_query_primary_contact_details(rf, user_gql_client):
     assert dict(executed["data"]) == expected_data
 
 
+def test_primary_contact_details_are_batch_loaded_for_profiles(
+    rf, superuser_gql_client, service
+):
+    def create_profile_with_contact_details():
+        profile = ProfileFactory()
+        PhoneFactory(profile=profile, primary=True)
+        EmailFactory(profile=profile, primary=True)
+        AddressFactory(profile=profile, primary=True)
+        ServiceConnectionFactory(profile=profile, service=service)
+        return profile
+
+    query = """
+        {
+            profiles(serviceType: BERTH) {
+                edges {
+                    node {
+                        primaryPhone { phone }
+                        primaryEmail { email }
+                        primaryAddress { address }
+                    }
+                }
+            }
+        }
+    """
+
+    executed = assert_query_count_constant(
+        rf, superuser_gql_client, query, create_profile_with_contact_details
+    )
+    assert "errors" not in executed
+    edges = executed["data"]["profiles"]["edges"]
+    assert len(edges) == 5
+    for edge in edges:
+        assert edge["node"]["primaryPhone"]
+        assert edge["node"]["primaryEmail"]
+        assert edge["node"]["primaryAddress"]
+
+
+def test_profile_connections_are_served_from_prefetch_cache(
+    rf, superuser_gql_client, service
+):
+    def create_profile_with_connections():
+        profile = ProfileFactory()
+        PhoneFactory(profile=profile)
+        EmailFactory(profile=profile)
+        AddressFactory(profile=profile)
+        ServiceConnectionFactory(profile=profile, service=service)
+        return profile
+
+    query = """
+        fragment contactInfo on ProfileNode {
+            phones { edges { node { phone } } }
+            emails { edges { node { email } } }
+        }
+        {
+            profiles(serviceType: BERTH) {
+                edges {
+                    node {
+                        ...contactInfo
+                        addresses { edges { node { address } } }
+                        serviceConnections { edges { node { service { type } } } }
+                    }
+                }
+            }
+        }
+    """
+
+    executed = assert_query_count_constant(
+        rf, superuser_gql_client, query, create_profile_with_connections
+    )
+    assert "errors" not in executed
+    edges = executed["data"]["profiles"]["edges"]
+    assert len(edges) == 5
+    for edge in edges:
+        for field_name in ("phones", "emails", "addresses", "serviceConnections"):
+            assert len(edge["node"][field_name]["edges"]) == 1
+
+
+def test_staff_user_sensitive_data_is_loaded_in_a_batch(
+    rf, user_gql_client, group, service
+):
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    assign_perm("can_view_sensitivedata", group, service)
+
+    def create_profile_with_sensitive_data():
+        profile = ProfileFactory()
+        SensitiveDataFactory(profile=profile)
+        ServiceConnectionFactory(profile=profile, service=service)
+        return profile
+
+    query = """
+        {
+            profiles(serviceType: BERTH) {
+                edges {
+                    node {
+                        sensitivedata { ssn }
+                    }
+                }
+            }
+        }
+    """
+
+    executed = assert_query_count_constant(
+        rf, user_gql_client, query, create_profile_with_sensitive_data
+    )
+    assert "errors" not in executed
+    edges = executed["data"]["profiles"]["edges"]
+    assert len(edges) == 5
+    for edge in edges:
+        assert edge["node"]["sensitivedata"]["ssn"]
+
+
 def test_normal_user_can_change_primary_contact_details(
     rf, user_gql_client, email_data, phone_data, address_data
 ):
@@ -1504,6 +1650,167 @@ def test_staff_user_can_filter_berth_profiles(rf, user_gql_client, group, servic
     assert dict(executed["data"]) == expected_data
 
 
+def test_total_count_of_berth_profiles_counts_only_berth_profiles(
+    rf, user_gql_client, group, service, service_factory
+):
+    berth_profile, youth_profile = ProfileFactory.create_batch(2)
+    ServiceConnectionFactory(profile=berth_profile, service=service)
+    ServiceConnectionFactory(
+        profile=youth_profile,
+        service=service_factory(service_type=ServiceType.YOUTH_MEMBERSHIP),
+    )
+    ProfileFactory()
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    query = """
+        {
+            profiles(serviceType: BERTH) {
+                count
+                totalCount
+            }
+        }
+    """
+
+    executed = user_gql_client.execute(query, context=request)
+    assert "errors" not in executed
+    assert dict(executed["data"]) == {"profiles": {"count": 1, "totalCount": 1}}
+
+
+@pytest.mark.parametrize("count_mode", ["exact", "estimate"])
+def test_offset_paged_profiles_are_counted_once_with_the_count_mode(
+    rf, user_gql_client, group, service, settings, count_mode
+):
+    settings.PROFILE_COUNT_MODE = count_mode
+    settings.PROFILE_COUNT_CACHE_TIMEOUT = 0
+    for last_name in ("Virtanen", "Virtala"):
+        profile = ProfileFactory(first_name="Jukka", last_name=last_name)
+        ServiceConnectionFactory(profile=profile, service=service)
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    # search results are ordered by the similarity, so they are paged with offsets
+    query = """
+        {
+            profiles(serviceType: BERTH, search: "Jukka", first: 1) {
+                count
+                edges {
+                    node {
+                        firstName
+                    }
+                }
+            }
+        }
+    """
+
+    with CaptureQueriesContext(connection) as context:
+        executed = user_gql_client.execute(query, context=request)
+    assert "errors" not in executed
+    assert executed["data"]["profiles"]["edges"] == [{"node": {"firstName": "Jukka"}}]
+    sql = [captured["sql"] for captured in context.captured_queries]
+    count_queries = [q for q in sql if "COUNT(" in q.upper()]
+    explain_queries = [q for q in sql if q.startswith("EXPLAIN")]
+    if count_mode == "exact":
+        assert executed["data"]["profiles"]["count"] == 2
+        assert (len(count_queries), len(explain_queries)) == (1, 0)
+    else:
+        assert executed["data"]["profiles"]["count"] >= 1
+        assert (len(count_queries), len(explain_queries)) == (0, 1)
+
+
+@pytest.mark.parametrize("estimate", [1, 100])
+def test_offset_pages_are_not_bounded_by_the_estimated_count(
+    rf, user_gql_client, group, service, settings, mocker, estimate
+):
+    settings.PROFILE_COUNT_MODE = "estimate"
+    settings.PROFILE_COUNT_CACHE_TIMEOUT = 0
+    mocker.patch("profiles.counting.get_estimated_count", return_value=estimate)
+    for last_name in ("Virtanen", "Virtala", "Virtaranta"):
+        profile = ProfileFactory(first_name="Jukka", last_name=last_name)
+        ServiceConnectionFactory(profile=profile, service=service)
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    query = """
+        query getBerthProfiles($after: String) {
+            profiles(serviceType: BERTH, search: "Jukka", first: 2, after: $after) {
+                count
+                pageInfo {
+                    endCursor
+                    hasNextPage
+                }
+                edges {
+                    node {
+                        lastName
+                    }
+                }
+            }
+        }
+    """
+
+    last_names = []
+    page_info = {"endCursor": None, "hasNextPage": True}
+    while page_info["hasNextPage"]:
+        executed = user_gql_client.execute(
+            query, variables={"after": page_info["endCursor"]}, context=request
+        )
+        assert "errors" not in executed
+        page = executed["data"]["profiles"]
+        assert page["count"] == estimate
+        last_names.extend(edge["node"]["lastName"] for edge in page["edges"])
+        page_info = page["pageInfo"]
+    assert sorted(last_names) == ["Virtala", "Virtanen", "Virtaranta"]
+
+
+def test_staff_user_can_search_berth_profiles(rf, user_gql_client, group, service):
+    profile_1, profile_2, profile_3 = (
+        ProfileFactory(first_name="Jukka", last_name="Virtanen"),
+        ProfileFactory(first_name="Jukka", last_name="Virtala"),
+        ProfileFactory(first_name="Mirja", last_name="Korhonen"),
+    )
+    EmailFactory(profile=profile_3, email="virtanen@example.com", primary=True)
+    for profile in (profile_1, profile_2, profile_3):
+        ServiceConnectionFactory(profile=profile, service=service)
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    query = """
+        query getBerthProfiles($serviceType: ServiceType!, $search: String){
+            profiles(serviceType: $serviceType, search: $search) {
+                edges {
+                    node {
+                        lastName
+                    }
+                }
+            }
+        }
+    """
+    executed = user_gql_client.execute(
+        query,
+        variables={"serviceType": ServiceType.BERTH.name, "search": "Virtanen"},
+        context=request,
+    )
+
+    assert "errors" not in executed
+    last_names = [
+        edge["node"]["lastName"] for edge in executed["data"]["profiles"]["edges"]
+    ]
+    assert last_names[0] == "Virtanen"
+    assert set(last_names) == {"Virtanen", "Virtala", "Korhonen"}
+
+
 def test_staff_user_can_sort_berth_profiles(rf, user_gql_client, group, service):
     profile_1, profile_2 = (
         ProfileFactory(first_name="Adam", last_name="Tester"),
@@ -1717,6 +2024,54 @@ def test_staff_user_can_filter_berth_profiles_by_emails(
     assert dict(executed["data"]) == expected_data
 
 
+def test_staff_user_filters_of_a_relation_match_the_same_related_object(
+    rf, user_gql_client, group, service
+):
+    profile_1, profile_2 = ProfileFactory.create_batch(2)
+    # two matching emails don't duplicate the profile
+    EmailFactory(profile=profile_1, primary=True, email="adam@example.com")
+    EmailFactory(profile=profile_1, primary=False, email="adam@example.org")
+    # the matching email is not the primary one
+    EmailFactory(profile=profile_2, primary=True, email="bryan@example.com")
+    EmailFactory(profile=profile_2, primary=False, email="adam.bryan@example.org")
+    ServiceConnectionFactory(profile=profile_1, service=service)
+    ServiceConnectionFactory(profile=profile_2, service=service)
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    query = """
+        query getBerthProfiles($email: String, $primary: Boolean){
+            profiles(serviceType: BERTH, emails_Email: $email, emails_Primary: $primary) {
+                count
+                edges {
+                    node {
+                        firstName
+                    }
+                }
+            }
+        }
+    """
+
+    executed = user_gql_client.execute(
+        query, variables={"email": "adam"}, context=request
+    )
+    assert "errors" not in executed
+    assert executed["data"]["profiles"]["count"] == 2
+    assert len(executed["data"]["profiles"]["edges"]) == 2
+
+    executed = user_gql_client.execute(
+        query, variables={"email": "adam", "primary": True}, context=request
+    )
+    assert "errors" not in executed
+    assert executed["data"]["profiles"] == {
+        "count": 1,
+        "edges": [{"node": {"firstName": profile_1.first_name}}],
+    }
+
+
 def test_staff_user_can_filter_berth_profiles_by_phones(
     rf, user_gql_client, group, service
 ):
@@ -2156,6 +2511,178 @@ def test_staff_user_can_paginate_berth_profiles(rf, user_gql_client, group, serv
     assert executed["data"]["profiles"] == expected_data
 
 
+def test_staff_user_can_paginate_berth_profiles_with_keyset_cursors(
+    rf, user_gql_client, group, service
+):
+    profiles = []
+    for index, city in enumerate(["Espoo", "Helsinki", None, "Helsinki", "Vantaa"]):
+        profile = ProfileFactory(first_name=f"Profile {index}")
+        if city:
+            AddressFactory(profile=profile, primary=True, city=city)
+        ServiceConnectionFactory(profile=profile, service=service)
+        profiles.append((profile, city))
+    # NULL values come first in descending order, ties are ordered by the pk
+    profiles.sort(key=lambda item: item[0].pk)
+    profiles.sort(key=lambda item: item[1] or "~", reverse=True)
+    expected_names = [profile.first_name for profile, city in profiles]
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    query = """
+        query getBerthProfiles(
+            $first: Int, $after: String, $last: Int, $before: String
+        ) {
+            profiles(
+                serviceType: BERTH,
+                orderBy: "-primaryCity",
+                first: $first,
+                after: $after,
+                last: $last,
+                before: $before
+            ) {
+                pageInfo {
+                    startCursor
+                    endCursor
+                    hasNextPage
+                    hasPreviousPage
+                }
+                edges {
+                    node {
+                        firstName
+                    }
+                }
+            }
+        }
+    """
+
+    def get_page(**variables):
+        executed = user_gql_client.execute(query, variables=variables, context=request)
+        assert "errors" not in executed
+        page = executed["data"]["profiles"]
+        return [edge["node"]["firstName"] for edge in page["edges"]], page["pageInfo"]
+
+    names = []
+    page_info = {"endCursor": None, "hasNextPage": True}
+    while page_info["hasNextPage"]:
+        page_names, page_info = get_page(first=2, after=page_info["endCursor"])
+        names.extend(page_names)
+    assert names == expected_names
+
+    names = []
+    page_info = {"startCursor": None, "hasPreviousPage": True}
+    while page_info["hasPreviousPage"]:
+        page_names, page_info = get_page(last=2, before=page_info["startCursor"])
+        names[:0] = page_names
+    assert names == expected_names
+
+
+@pytest.mark.parametrize("search", [None, "Adam"])
+def test_invalid_cursor_is_rejected(rf, user_gql_client, group, service, search):
+    profile = ProfileFactory(first_name="Adam")
+    ServiceConnectionFactory(profile=profile, service=service)
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, service)
+    request = rf.post("/graphql")
+    request.user = user
+
+    query = """
+        query getBerthProfiles($search: String, $after: String) {
+            profiles(serviceType: BERTH, search: $search, first: 1, after: $after) {
+                pageInfo {
+                    endCursor
+                }
+            }
+        }
+    """
+    executed = user_gql_client.execute(
+        query, variables={"search": search}, context=request
+    )
+    cursor = executed["data"]["profiles"]["pageInfo"]["endCursor"]
+
+    # a cursor of another ordering doesn't point to any row of this one
+    executed = user_gql_client.execute(
+        query.replace("first: 1", 'orderBy: "lastName", first: 1'),
+        variables={"search": search, "after": cursor},
+        context=request,
+    )
+    assert executed["errors"][0]["extensions"]["code"] == INVALID_CURSOR_ERROR
+
+    for invalid_cursor in ("invalid", cursor[:-1]):
+        executed = user_gql_client.execute(
+            query,
+            variables={"search": search, "after": invalid_cursor},
+            context=request,
+        )
+        assert executed["data"]["profiles"] is None
+        assert executed["errors"][0]["extensions"]["code"] == INVALID_CURSOR_ERROR
+
+
+def test_federated_profile_references_are_resolved_in_a_batch(
+    rf, user_gql_client, group, service_factory
+):
+    berth_service = service_factory(service_type=ServiceType.BERTH)
+    youth_service = service_factory(service_type=ServiceType.YOUTH_MEMBERSHIP)
+    user = user_gql_client.user
+    user.groups.add(group)
+    assign_perm("can_view_profiles", group, berth_service)
+
+    def create_berth_profile():
+        profile = ProfileFactory()
+        ServiceConnectionFactory(profile=profile, service=berth_service)
+        return profile
+
+    def create_youth_profile():
+        profile = ProfileFactory()
+        ServiceConnectionFactory(profile=profile, service=youth_service)
+        return profile
+
+    profile_creators = iter(
+        [
+            create_berth_profile,
+            lambda: ProfileFactory(user=user),
+            create_berth_profile,
+            create_berth_profile,
+            create_youth_profile,
+        ]
+    )
+
+    def create_profile():
+        profile = next(profile_creators)()
+        profiles.append(profile)
+        return profile
+
+    def get_variables(created_profiles):
+        return {
+            "representations": [
+                {"__typename": "ProfileNode", "id": to_global_id("ProfileNode", p.id)}
+                for p in created_profiles
+            ]
+        }
+
+    query = """
+        query getProfiles($representations: [_Any]) {
+            _entities(representations: $representations) {
+                ... on ProfileNode {
+                    firstName
+                }
+            }
+        }
+    """
+
+    profiles = []
+    executed = assert_query_count_constant(
+        rf, user_gql_client, query, create_profile, variables=get_variables
+    )
+    assert executed["data"]["_entities"] == [
+        {"firstName": profile.first_name} for profile in profiles[:4]
+    ] + [None]
+    assert len(executed["errors"]) == 1
+
+
 def test_staff_user_with_group_access_can_query_only_profiles_he_has_access_to(
     rf, user_gql_client, group, service_factory
 ):
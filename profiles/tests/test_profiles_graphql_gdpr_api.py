@@ -1,4 +1,6 @@
 import json
+import threading
+import time
 
 import pytest
 import requests
@@ -139,7 +141,7 @@ def test_user_tries_deleting_his_profile_but_it_fails_partially(
     connected services should still get deleted.
     """
 
-    def mock_gdpr_delete(self, dry_run=False):
+    def mock_gdpr_delete(self, dry_run=False, deadline=None):
         if self.service.service_type == ServiceType.BERTH and not dry_run:
             raise requests.HTTPError("Such big fail! :(")
 
@@ -168,6 +170,69 @@ def test_user_tries_deleting_his_profile_but_it_fails_partially(
     )
 
 
+def test_user_cannot_delete_his_profile_if_service_does_not_respond_in_time(
+    rf, user_gql_client, service_factory, monkeypatch, settings
+):
+    release_slow_service = threading.Event()
+
+    def mock_gdpr_delete(self, dry_run=False, deadline=None):
+        if self.service.service_type == ServiceType.BERTH:
+            release_slow_service.wait(timeout=5)
+        return True
+
+    monkeypatch.setattr(ServiceConnection, "delete_gdpr_data", mock_gdpr_delete)
+    settings.GDPR_API_DEADLINE = 0.1
+
+    profile = ProfileFactory(user=user_gql_client.user)
+    for st in ServiceType:
+        service = service_factory(service_type=st, title=st.label, gdpr_url=GDPR_URL)
+        ServiceConnectionFactory(profile=profile, service=service)
+    request = rf.post("/graphql")
+    request.user = user_gql_client.user
+
+    try:
+        executed = user_gql_client.execute(DELETE_MY_PROFILE_MUTATION, context=request)
+    finally:
+        release_slow_service.set()
+
+    assert dict(executed["data"]) == {"deleteMyProfile": None}
+    assert (
+        executed["errors"][0]["extensions"]["code"]
+        == CONNECTED_SERVICE_DELETION_NOT_ALLOWED_ERROR
+    )
+    assert ServiceConnection.objects.count() == len(ServiceType)
+    profile.refresh_from_db()
+
+
+def test_deletions_sent_to_services_are_waited_for_past_the_deadline(
+    rf, user_gql_client, service_factory, monkeypatch, settings
+):
+    """The dry run and the deletion have their own deadlines, and a deletion which has
+    been sent to a service is not abandoned when the deadline is exceeded.
+    """
+
+    def mock_gdpr_delete(self, dry_run=False, deadline=None):
+        time.sleep(0.07 if dry_run else 0.2)
+        return True
+
+    monkeypatch.setattr(ServiceConnection, "delete_gdpr_data", mock_gdpr_delete)
+    settings.GDPR_API_DEADLINE = 0.1
+
+    profile = ProfileFactory(user=user_gql_client.user)
+    for st in ServiceType:
+        service = service_factory(service_type=st, title=st.label, gdpr_url=GDPR_URL)
+        ServiceConnectionFactory(profile=profile, service=service)
+    request = rf.post("/graphql")
+    request.user = user_gql_client.user
+
+    executed = user_gql_client.execute(DELETE_MY_PROFILE_MUTATION, context=request)
+
+    assert "errors" not in executed
+    assert dict(executed["data"]) == {"deleteMyProfile": {"clientMutationId": None}}
+    with pytest.raises(Profile.DoesNotExist):
+        profile.refresh_from_db()
+
+
 @pytest.mark.parametrize(
     "gdpr_url, response_status", [("", 204), ("", 405), (GDPR_URL, 405)]
 )
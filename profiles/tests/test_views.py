@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from services.tests.factories import ServiceConnectionFactory
+from utils.streaming import STREAM_ERROR_MARKER
+
+from ..models import Profile
+from .factories import ProfileWithPrimaryEmailFactory
+
+GDPR_URL = "https://example.com/"
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+def test_user_can_download_profile_as_a_stream(
+    api_client, user, service_factory, requests_mock
+):
+    profile = ProfileWithPrimaryEmailFactory(user=user)
+    service = service_factory(gdpr_url=GDPR_URL)
+    ServiceConnectionFactory(profile=profile, service=service)
+    service_data = {"key": "BERTH", "children": []}
+    requests_mock.get(f"{GDPR_URL}{profile.pk}", json=service_data)
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("profiles:download-my-profile"))
+
+    assert response.status_code == 200
+    assert response.streaming
+    data = json.loads(b"".join(response.streaming_content))
+    assert data == {
+        "key": "DATA",
+        "children": [profile.serialize(), service_data],
+    }
+
+
+def test_profile_download_failing_after_the_response_started_is_marked_incomplete(
+    api_client, user, service_factory, requests_mock
+):
+    profile = ProfileWithPrimaryEmailFactory(user=user)
+    service = service_factory(gdpr_url=GDPR_URL)
+    ServiceConnectionFactory(profile=profile, service=service)
+    requests_mock.get(f"{GDPR_URL}{profile.pk}", text="not json")
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("profiles:download-my-profile"))
+
+    assert response.status_code == 200
+    content = b"".join(response.streaming_content).decode()
+    assert content.endswith(STREAM_ERROR_MARKER)
+    with pytest.raises(ValueError):
+        json.loads(content)
+
+
+def test_profile_serialization_failing_is_marked_incomplete(
+    api_client, user, monkeypatch
+):
+    ProfileWithPrimaryEmailFactory(user=user)
+
+    def fail_iter_serialized(self):
+        raise RuntimeError("Serialization failed")
+
+    monkeypatch.setattr(Profile, "iter_serialized", fail_iter_serialized)
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("profiles:download-my-profile"))
+
+    assert response.status_code == 200
+    content = b"".join(response.streaming_content).decode()
+    assert content.endswith(STREAM_ERROR_MARKER)
+
+
+def test_anonymous_user_cannot_download_profile(api_client):
+    response = api_client.get(reverse("profiles:download-my-profile"))
+
+    assert response.status_code == 401
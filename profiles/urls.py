@@ -0,0 +1,8 @@
+from django.urls import path
+
+from profiles.views import DownloadMyProfileView
+
+app_name = "profiles"
+urlpatterns = [
+    path("me/download", DownloadMyProfileView.as_view(), name="download-my-profile"),
+]
@@ -1,8 +1,11 @@
 import threading
-from typing import TYPE_CHECKING
+from typing import Iterable, Set, TYPE_CHECKING
 
 from django.core.exceptions import ValidationError
+from graphql.language.ast import Field, FragmentSpread, InlineFragment
 from graphql_relay.node.node import from_global_id
+from guardian.core import ObjectPermissionChecker
+from guardian.shortcuts import get_objects_for_user
 
 from open_city_profile.exceptions import InvalidEmailFormatError
 
@@ -52,6 +55,42 @@ def delete_nested(model, profile, data):
         model.objects.get(profile=profile, pk=from_global_id(remove_id)[1]).delete()
 
 
+def _collect_selections(selection_set, fragments):
+    fields = []
+    for selection in selection_set.selections if selection_set else []:
+        if isinstance(selection, Field):
+            fields.append(selection)
+        elif isinstance(selection, FragmentSpread):
+            fields += _collect_selections(
+                fragments[selection.name.value].selection_set, fragments
+            )
+        elif isinstance(selection, InlineFragment):
+            fields += _collect_selections(selection.selection_set, fragments)
+    return fields
+
+
+def get_selected_field_names(info, path=()):
+    """
+    Returns the names of the fields selected in the query for the field being resolved.
+
+    Path can be used for looking further into the selection set, e.g. path ("edges", "node")
+    returns the fields selected for the nodes of a connection. Fragments are resolved.
+    """
+    fields = [
+        field
+        for field_ast in info.field_asts
+        for field in _collect_selections(field_ast.selection_set, info.fragments)
+    ]
+    for name in path:
+        fields = [
+            nested_field
+            for field in fields
+            if field.name.value == name
+            for nested_field in _collect_selections(field.selection_set, info.fragments)
+        ]
+    return {field.name.value for field in fields}
+
+
 def set_current_user(user):
     _thread_locals.user = user
 
@@ -64,6 +103,18 @@ def set_current_service(service):
     _thread_locals.service = service
 
 
+def start_collecting_audit_log_reads():
+    _thread_locals.audit_log_reads = {}
+
+
+def get_audit_log_reads():
+    return getattr(_thread_locals, "audit_log_reads", None)
+
+
+def pop_audit_log_reads():
+    return _thread_locals.__dict__.pop("audit_log_reads", None)
+
+
 def get_current_user():
     return getattr(_thread_locals, "user", None)
 
@@ -72,6 +123,87 @@ def get_current_service():
     return getattr(_thread_locals, "service", None)
 
 
+class ServicePermissions:
+    """
+    Request scoped cache of the services and the object permissions of a user for them.
+
+    The services are taken from the service registry and the permissions of the user for
+    them are loaded on first use, after which looking up a service or checking a permission
+    for it doesn't query the database.
+    The permissions are checked like the user's has_perm checks them, i.e. active superusers
+    have all permissions and other users the ones given by django-guardian.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._services = None
+        self._checker = None
+
+    def _load(self):
+        from services.registry import get_services
+
+        # the request keeps using the services it started with
+        self._services = get_services()
+        if self.user.is_active and not self.user.is_superuser:
+            self._checker = ObjectPermissionChecker(self.user)
+            self._checker.prefetch_perms(list(self._services.values()))
+
+    def get_service(self, service_type):
+        from services.enums import ServiceType
+        from services.models import Service
+
+        if self._services is None:
+            self._load()
+        try:
+            return self._services[ServiceType(service_type)]
+        except (KeyError, ValueError):
+            raise Service.DoesNotExist("Service matching query does not exist.")
+
+    def has_perm(self, perm, service):
+        if not self.user.is_active:
+            return False
+        if self.user.is_superuser:
+            return True
+        if self._services is None:
+            self._load()
+        return self._checker.has_perm(perm, service)
+
+
+def get_service_permissions(request):
+    """Returns the ServicePermissions of the request user, cached on the request."""
+    permissions = getattr(request, "_service_permissions", None)
+    if permissions is None or permissions.user is not request.user:
+        permissions = ServicePermissions(request.user)
+        request._service_permissions = permissions
+    return permissions
+
+
+def get_profiles_visible_to_staff(
+    user: "users.models.User", profiles: Iterable["profiles.models.Profile"]
+) -> Set:
+    """
+    Returns the ids of the passed profiles which the passed user may view as staff, i.e.
+    the ones with an enabled connection to a service the user has "can_view_profiles"
+    permissions for.
+
+    The services are resolved from the user's object permissions in a subquery, so any
+    number of profiles is checked with a single query.
+    """
+    from services.models import Service, ServiceConnection
+
+    # inactive users have no permissions and superusers have all of them
+    if not user.is_active:
+        return set()
+    service_conns = ServiceConnection.objects.filter(profile__in=profiles, enabled=True)
+    if not user.is_superuser:
+        service_conns = service_conns.filter(
+            service__in=get_objects_for_user(
+                user, "can_view_profiles", klass=Service, accept_global_perms=False
+            )
+        )
+    return set(service_conns.values_list("profile_id", flat=True))
+
+
 def user_has_staff_perms_to_view_profile(
     user: "users.models.User", profile: "profiles.models.Profile"
 ) -> bool:
@@ -79,11 +211,4 @@ def user_has_staff_perms_to_view_profile(
     Checks is passed user has "can_view_profiles" permissions
     for any service connected to the passed profile.
     """
-
-    service_conns = profile.service_connections.filter(enabled=True)
-    return any(
-        [
-            user.has_perm("can_view_profiles", service_conn.service)
-            for service_conn in service_conns
-        ]
-    )
+    return profile.pk in get_profiles_visible_to_staff(user, [profile])
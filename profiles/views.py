@@ -0,0 +1,36 @@
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from open_city_profile.oidc import CachedApiTokenAuthentication
+from profiles.models import Profile
+from utils.streaming import iter_json_response
+
+
+def _iter_gdpr_data(profile):
+    yield profile.iter_serialized()
+    for item in profile.get_service_gdpr_data():
+        yield item.json()
+
+
+class DownloadMyProfileView(APIView):
+    authentication_classes = [CachedApiTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """Stream the GDPR export of the profile of the authenticated user.
+
+        Both the profile data and the connected services are read while the response is
+        streamed. The related objects of the profile are not prefetched but iterated one
+        relation at a time, so the memory use does not grow with the size of the profile.
+        The status is already sent when the data is read, so a failure ends the content
+        with STREAM_ERROR_MARKER instead of returning an error status.
+        """
+        profile = get_object_or_404(Profile, user=request.user)
+        data = {"key": "DATA", "children": _iter_gdpr_data(profile)}
+        response = StreamingHttpResponse(
+            iter_json_response(data), content_type="application/json"
+        )
+        response["Content-Disposition"] = "attachment; filename=profile.json"
+        return response
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("services", "0013_add_gdpr_api_scopes_to_services"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="service",
+            name="gdpr_timeout",
+            field=models.PositiveSmallIntegerField(
+                default=5, help_text="Timeout in seconds for the GDPR API requests"
+            ),
+        ),
+    ]
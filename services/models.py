@@ -1,6 +1,5 @@
 import urllib.parse
 
-import requests
 from adminsortable.models import SortableMixin
 from django.conf import settings
 from django.db import models
@@ -12,6 +11,7 @@ from utils.models import SerializableMixin
 
 from .enums import ServiceType
 from .exceptions import MissingGDPRUrlException
+from .utils import get_gdpr_request_timeout, get_gdpr_session, measure_gdpr_api_call
 
 
 def get_next_data_field_order():
@@ -56,6 +56,9 @@ class Service(TranslatableModel):
     gdpr_delete_scope = models.CharField(
         max_length=200, blank=True, help_text="GDPR API delete operation scope"
     )
+    gdpr_timeout = models.PositiveSmallIntegerField(
+        default=5, help_text="Timeout in seconds for the GDPR API requests"
+    )
 
     class Meta:
         permissions = (
@@ -93,25 +96,34 @@ class ServiceConnection(SerializableMixin):
         {"name": "created_at", "accessor": lambda x: x.strftime("%Y-%m-%d")},
     )
 
-    def download_gdpr_data(self):
-        """Download service specific GDPR data by profile."""
+    def _gdpr_api_request(self, method, deadline=None, **kwargs):
+        url = urllib.parse.urljoin(self.service.gdpr_url, str(self.profile.pk))
+        with measure_gdpr_api_call(self.service.service_type):
+            timeout = get_gdpr_request_timeout(self.service.gdpr_timeout, deadline)
+            response = get_gdpr_session(url).request(
+                method, url, timeout=timeout, **kwargs
+            )
+            response.raise_for_status()
+        return response
+
+    def download_gdpr_data(self, deadline=None):
+        """Download service specific GDPR data by profile.
+
+        Deadline is the time.monotonic() value by which the download has to end. Raises
+        requests.RequestException if the service fails to respond or responds with an error.
+        """
         if self.service.gdpr_url:
-            url = urllib.parse.urljoin(self.service.gdpr_url, str(self.profile.pk))
-            try:
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                return response
-            except requests.RequestException:
-                return {}
+            return self._gdpr_api_request("GET", deadline=deadline)
         return {}
 
-    def delete_gdpr_data(self, dry_run=False):
+    def delete_gdpr_data(self, dry_run=False, deadline=None):
         """Delete service specific GDPR data by profile.
 
         Dry run parameter can be used for asking the service if delete is possible.
         An exception will be raised by this method if deletion response from the
         service indicates an error or if GDPR related URLs have not been configured
-        for the related service.
+        for the related service. Deadline is the time.monotonic() value by which the
+        deletion has to end.
         """
         data = {}
         if dry_run:
@@ -128,9 +140,7 @@ class ServiceConnection(SerializableMixin):
             return True
 
         if self.service.gdpr_url:
-            url = urllib.parse.urljoin(self.service.gdpr_url, str(self.profile.pk))
-            response = requests.delete(url, timeout=5, data=data)
-            response.raise_for_status()
+            self._gdpr_api_request("DELETE", deadline=deadline, data=data)
             return True
 
         raise MissingGDPRUrlException(
@@ -0,0 +1,84 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+
+from .enums import ServiceType
+
+SERVICE_REGISTRY_VERSION_KEY = "services:registry_version"
+
+# (version, loaded_at, {language: {service_type: service}}) of the services loaded in this
+# process
+_registry = None
+
+
+def _get_version():
+    version = cache.get(SERVICE_REGISTRY_VERSION_KEY)
+    if version is None:
+        cache.add(SERVICE_REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(SERVICE_REGISTRY_VERSION_KEY)
+    return version
+
+
+def invalidate_services():
+    """
+    Make every process reload the services on their next use.
+
+    The version is a random value instead of a counter, so that a version evicted from the
+    cache can't be mistaken for an earlier one.
+    """
+    global _registry
+    _registry = None
+    cache.set(SERVICE_REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _load_services(language):
+    from .models import Service
+
+    # parler translates the instances to the language which is active when they are loaded
+    with translation.override(language):
+        services = Service.objects.prefetch_related(
+            "translations", "allowed_data_fields__translations"
+        )
+        return {service.service_type: service for service in services}
+
+
+def get_services():
+    """
+    Returns the services by their service type.
+
+    The services are loaded once per process and language with their translations and
+    allowed data fields, so that the returned instances are translated to the active
+    language. They are reloaded when the version shared through the cache has changed, or
+    when they are older than SERVICE_REGISTRY_TIMEOUT. The version is only shared by the
+    processes which use the same cache, so the timeout limits how long the other processes
+    use outdated services. The returned instances are shared and must not be modified.
+    """
+    global _registry
+    version = _get_version()
+    registry = _registry
+    if (
+        registry is None
+        or registry[0] != version
+        or time.monotonic() - registry[1] >= settings.SERVICE_REGISTRY_TIMEOUT
+    ):
+        registry = (version, time.monotonic(), {})
+        _registry = registry
+    language = translation.get_language()
+    services = registry[2].get(language)
+    if services is None:
+        services = _load_services(language)
+        registry[2][language] = services
+    return services
+
+
+def get_service(service_type):
+    """Returns the service of the service type, like Service.objects.get() would."""
+    from .models import Service
+
+    try:
+        return get_services()[ServiceType(service_type)]
+    except (KeyError, ValueError):
+        raise Service.DoesNotExist("Service matching query does not exist.")
@@ -9,6 +9,7 @@ from open_city_profile.exceptions import ServiceAlreadyExistsError
 
 from .enums import ServiceType
 from .models import AllowedDataField, Service, ServiceConnection
+from .registry import get_service
 
 AllowedServiceType = graphene.Enum.from_enum(
     ServiceType, description=lambda e: e.label if e else ""
@@ -64,7 +65,7 @@ class AddServiceConnectionMutation(relay.ClientIDMutation):
         service_connection_data = input.pop("service_connection")
         service_data = service_connection_data.get("service")
         service_type = service_data.get("type")
-        service = Service.objects.get(service_type=service_type)
+        service = get_service(service_type)
         try:
             service_connection = ServiceConnection.objects.create(
                 profile=info.context.user.profile,
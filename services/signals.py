@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import AllowedDataField, Service
+from .registry import invalidate_services
+
+
+def invalidate_service_registry(**kwargs):
+    invalidate_services()
+    # once more after the commit, in case another process reloaded the services before it
+    transaction.on_commit(invalidate_services)
+
+
+# The registry holds the services with their translations and allowed data fields
+for registry_model in (
+    Service,
+    Service._parler_meta.root_model,
+    AllowedDataField,
+    AllowedDataField._parler_meta.root_model,
+):
+    post_save.connect(invalidate_service_registry, sender=registry_model)
+    post_delete.connect(invalidate_service_registry, sender=registry_model)
+m2m_changed.connect(
+    invalidate_service_registry, sender=Service.allowed_data_fields.through
+)
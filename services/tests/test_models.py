@@ -1,4 +1,5 @@
 import pytest
+import requests
 from django.db.utils import IntegrityError
 
 from ..enums import ServiceType
@@ -91,5 +92,5 @@ def test_download_gdpr_data_with_invalid_url(requests_mock, profile, service_fac
         f"http://invalid-gdpr-url.com/profiles/{profile.pk}", json={}, status_code=404
     )
 
-    response = service_connection.download_gdpr_data()
-    assert response == {}
+    with pytest.raises(requests.HTTPError):
+        service_connection.download_gdpr_data()
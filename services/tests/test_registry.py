@@ -0,0 +1,74 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+
+from ..enums import ServiceType
+from ..models import Service
+from ..registry import get_service, get_services
+
+
+def test_services_are_loaded_once(service_factory, allowed_data_field_factory):
+    service = service_factory()
+    service.allowed_data_fields.add(allowed_data_field_factory())
+    get_services()
+
+    with CaptureQueriesContext(connection) as context:
+        registry_service = get_service(ServiceType.BERTH.value)
+        assert registry_service == service
+        assert registry_service.title == "Berth"
+        assert len(registry_service.allowed_data_fields.all()) == 1
+    assert len(context.captured_queries) == 0
+
+
+def test_services_are_reloaded_after_changes(service_factory, allowed_data_field):
+    service = service_factory()
+    assert get_service(ServiceType.BERTH).title == "Berth"
+
+    service.title = "Boat berth"
+    service.save()
+    assert get_service(ServiceType.BERTH).title == "Boat berth"
+
+    service.allowed_data_fields.add(allowed_data_field)
+    assert list(get_service(ServiceType.BERTH).allowed_data_fields.all()) == [
+        allowed_data_field
+    ]
+
+    service.delete()
+    with pytest.raises(Service.DoesNotExist):
+        get_service(ServiceType.BERTH)
+
+
+def test_services_are_reloaded_after_the_timeout(service_factory, settings):
+    service = service_factory()
+    get_services()
+    # changes made without the signals, e.g. by a process which doesn't share the cache
+    Service.objects.filter(pk=service.pk).update(
+        service_type=ServiceType.YOUTH_MEMBERSHIP
+    )
+    assert ServiceType.BERTH in get_services()
+
+    settings.SERVICE_REGISTRY_TIMEOUT = 0
+    assert list(get_services()) == [ServiceType.YOUTH_MEMBERSHIP]
+
+
+def test_services_are_translated_to_the_active_language(
+    service_factory, allowed_data_field
+):
+    service = service_factory()
+    service.allowed_data_fields.add(allowed_data_field)
+    for language in ("fi", "en"):
+        service.set_current_language(language)
+        service.title = f"Berth {language}"
+        service.save()
+        allowed_data_field.set_current_language(language)
+        allowed_data_field.label = f"Label {language}"
+        allowed_data_field.save()
+
+    for language in ("fi", "en", "fi"):
+        with translation.override(language):
+            registry_service = get_service(ServiceType.BERTH)
+            assert registry_service.title == f"Berth {language}"
+            assert [
+                field.label for field in registry_service.allowed_data_fields.all()
+            ] == [f"Label {language}"]
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from ..enums import ServiceType
+from ..utils import (
+    call_for_service_connections,
+    get_gdpr_api_metrics,
+    get_gdpr_request_timeout,
+    get_gdpr_session,
+    measure_gdpr_api_call,
+)
+from .factories import ServiceConnectionFactory
+
+
+def test_gdpr_session_is_shared_per_host():
+    session = get_gdpr_session("https://example.com/profiles/1")
+
+    assert get_gdpr_session("https://example.com/profiles/2") is session
+    assert get_gdpr_session("https://other.example.com/profiles/1") is not session
+    assert get_gdpr_session("http://example.com/profiles/1") is not session
+
+
+def test_gdpr_session_retries_only_get_requests_after_sending_them():
+    url = "https://retry.example.com/profiles/1"
+    retry = get_gdpr_session(url).get_adapter(url).max_retries
+
+    assert retry.is_retry("GET", 503)
+    assert not retry.is_retry("DELETE", 503)
+
+
+def test_gdpr_request_timeout_fits_retries_in_the_deadline(settings):
+    settings.GDPR_API_MAX_RETRIES = 2
+    settings.GDPR_API_RETRY_BACKOFF = 0.5
+
+    assert get_gdpr_request_timeout(5) == 5
+    assert get_gdpr_request_timeout(1, deadline=time.monotonic() + 10) == 1
+    # three attempts and a backoff of one second in the remaining four seconds
+    assert get_gdpr_request_timeout(5, deadline=time.monotonic() + 4) <= 1
+    with pytest.raises(requests.Timeout):
+        get_gdpr_request_timeout(5, deadline=time.monotonic() - 1)
+
+
+def test_gdpr_api_calls_are_measured_per_service_type():
+    before = get_gdpr_api_metrics().get(ServiceType.BERTH.value, {})
+
+    with measure_gdpr_api_call(ServiceType.BERTH):
+        pass
+    with pytest.raises(requests.HTTPError):
+        with measure_gdpr_api_call(ServiceType.BERTH):
+            raise requests.HTTPError()
+
+    after = get_gdpr_api_metrics()[ServiceType.BERTH.value]
+    assert after["calls"] == before.get("calls", 0) + 2
+    assert after["errors"] == before.get("errors", 0) + 1
+
+
+def test_gdpr_api_requests_use_service_timeout(requests_mock, profile, service_factory):
+    service = service_factory(gdpr_url="https://example.com/", gdpr_timeout=2)
+    service_connection = ServiceConnectionFactory(profile=profile, service=service)
+    requests_mock.get(f"https://example.com/{profile.pk}", json={})
+
+    service_connection.download_gdpr_data()
+
+    assert requests_mock.last_request.timeout == 2
+
+
+@pytest.mark.parametrize("wait_for_all", [False, True])
+def test_calls_queued_past_the_timeout_are_made_only_when_waiting_for_all(
+    settings, profile, service_factory, wait_for_all
+):
+    settings.GDPR_API_MAX_WORKERS = 1
+    service_connections = [
+        ServiceConnectionFactory(
+            profile=profile, service=service_factory(service_type=service_type)
+        )
+        for service_type in (ServiceType.BERTH, ServiceType.YOUTH_MEMBERSHIP)
+    ]
+    release = threading.Event()
+
+    def call(service_connection):
+        release.wait(timeout=5)
+        return service_connection.service.service_type
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    try:
+        results = call_for_service_connections(
+            service_connections, call, timeout=0.1, wait_for_all=wait_for_all
+        )
+    finally:
+        release.set()
+        timer.cancel()
+
+    if wait_for_all:
+        assert [result.result for result in results] == [
+            ServiceType.BERTH,
+            ServiceType.YOUTH_MEMBERSHIP,
+        ]
+    else:
+        assert all(isinstance(result.error, requests.Timeout) for result in results)
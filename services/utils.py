@@ -0,0 +1,170 @@
+import concurrent.futures
+import threading
+import time
+import urllib.parse
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+ServiceConnectionResult = namedtuple(
+    "ServiceConnectionResult", ("service_connection", "result", "error")
+)
+
+_gdpr_sessions = {}
+_gdpr_sessions_lock = threading.Lock()
+
+_gdpr_api_metrics = defaultdict(
+    lambda: {"calls": 0, "errors": 0, "total_duration": 0.0, "max_duration": 0.0}
+)
+_gdpr_api_metrics_lock = threading.Lock()
+
+
+def _create_gdpr_session():
+    # Only GET requests are retried after they have been sent. A DELETE is retried only
+    # on connection errors, when the service has not received it.
+    retry = Retry(
+        total=settings.GDPR_API_MAX_RETRIES,
+        backoff_factor=settings.GDPR_API_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        method_whitelist=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=settings.GDPR_API_POOL_SIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_gdpr_session(url):
+    """
+    Return the HTTP session used for the GDPR API calls to the host of the given URL.
+
+    Every host gets its own session, which keeps the connections to the host alive in a
+    pool of GDPR_API_POOL_SIZE connections and retries failed requests with a backoff.
+    Use get_gdpr_request_timeout for the timeout of the requests, so that the retries don't
+    run past the deadline of the calls.
+    """
+    split_url = urllib.parse.urlsplit(url)
+    host = (split_url.scheme, split_url.netloc)
+    with _gdpr_sessions_lock:
+        if host not in _gdpr_sessions:
+            _gdpr_sessions[host] = _create_gdpr_session()
+        return _gdpr_sessions[host]
+
+
+def get_gdpr_request_timeout(timeout, deadline=None):
+    """
+    Return the timeout of a single attempt of a GDPR API request.
+
+    The timeout is shortened so that the attempt, its retries and the backoffs between them
+    fit in the time left until the deadline (a time.monotonic() value). Raises
+    requests.Timeout if the deadline has already passed.
+    """
+    if deadline is None:
+        return timeout
+    retries = settings.GDPR_API_MAX_RETRIES
+    # urllib3 retries the first time immediately, then sleeps backoff * 2 ** (n - 1)
+    backoff = sum(
+        settings.GDPR_API_RETRY_BACKOFF * 2 ** (n - 1) for n in range(2, retries + 1)
+    )
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise requests.Timeout("The GDPR API deadline was exceeded.")
+    available = remaining - backoff if remaining > backoff else remaining
+    return min(timeout, available / (retries + 1))
+
+
+@contextmanager
+def measure_gdpr_api_call(service_type):
+    """Record the duration and the possible error of a GDPR API call to the service."""
+    start = time.monotonic()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        duration = time.monotonic() - start
+        with _gdpr_api_metrics_lock:
+            metrics = _gdpr_api_metrics[service_type.value]
+            metrics["calls"] += 1
+            metrics["errors"] += int(failed)
+            metrics["total_duration"] += duration
+            metrics["max_duration"] = max(metrics["max_duration"], duration)
+
+
+def get_gdpr_api_metrics():
+    """Return the GDPR API call metrics of this process by service type."""
+    with _gdpr_api_metrics_lock:
+        return {
+            service_type: dict(metrics)
+            for service_type, metrics in _gdpr_api_metrics.items()
+        }
+
+
+def call_for_service_connections(
+    service_connections, function, timeout=None, wait_for_all=False
+):
+    """
+    Calls the function for each of the given service connections concurrently.
+
+    Returns a ServiceConnectionResult for every service connection in the given order.
+    Exceptions raised by the function are returned in the result instead of raising them.
+    Calls not finished within the timeout (in seconds, defaults to GDPR_API_DEADLINE
+    setting) are reported with a requests.Timeout error.
+
+    With wait_for_all, every call gets its own worker, so that all the calls are started
+    right away instead of queueing for GDPR_API_MAX_WORKERS workers, and all of them are
+    waited for and their results returned even if the timeout expires. This is needed for
+    calls which must neither be left unmade nor left running unnoticed, e.g. deletions.
+
+    The function is run in worker threads, so everything it needs from the database has to
+    be loaded beforehand, e.g. using select_related.
+    """
+    service_connections = list(service_connections)
+    if not service_connections:
+        return []
+    if timeout is None:
+        timeout = settings.GDPR_API_DEADLINE
+
+    max_workers = len(service_connections)
+    if not wait_for_all:
+        max_workers = min(max_workers, settings.GDPR_API_MAX_WORKERS)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [
+            executor.submit(function, service_connection)
+            for service_connection in service_connections
+        ]
+        concurrent.futures.wait(futures, timeout=timeout)
+        if not wait_for_all:
+            # Calls still waiting for a worker are not started anymore
+            for future in futures:
+                future.cancel()
+    finally:
+        # Don't wait for the running calls that exceeded the timeout, unless asked to
+        executor.shutdown(wait=wait_for_all)
+
+    results = []
+    for service_connection, future in zip(service_connections, futures):
+        if future.cancelled() or not future.done():
+            error = requests.Timeout(
+                f"Service {service_connection.service.service_type.name} did not respond "
+                f"within {timeout} seconds."
+            )
+            results.append(ServiceConnectionResult(service_connection, None, error))
+        elif future.exception():
+            results.append(
+                ServiceConnectionResult(service_connection, None, future.exception())
+            )
+        else:
+            results.append(
+                ServiceConnectionResult(service_connection, future.result(), None)
+            )
+    return results
@@ -1,4 +1,5 @@
 import uuid
+from collections import namedtuple
 
 from django.db import models
 from django.db.models.fields.reverse_related import OneToOneRel
@@ -11,6 +12,19 @@ class UUIDModel(models.Model):
         abstract = True
 
 
+class SerializationStep(
+    namedtuple("SerializationStep", ("name", "key", "kind", "accessor"))
+):
+    """Serialization of a single field in a compiled serialization plan."""
+
+    VALUE = "value"
+    ONE_TO_ONE = "one_to_one"
+    MANY = "many"
+
+
+_serialization_plans = {}
+
+
 class SerializableMixin(models.Model):
     """
     Mixin to add custom serialization for django models in order to get the desired tree of models to
@@ -73,56 +87,142 @@ class SerializableMixin(models.Model):
     """
 
     class SerializableManager(models.Manager):
+        def for_serialization(self):
+            """Returns a queryset which loads everything serialize() needs up front."""
+            queryset = self.get_queryset()
+            select_related = self.model._get_serialization_select_related()
+            if select_related:
+                queryset = queryset.select_related(*select_related)
+            return queryset.prefetch_related(*self.model.get_serialization_prefetches())
+
         def serialize(self):
+            # all() uses the prefetched objects of a related manager, if there are any
             return [
                 obj.serialize() if hasattr(obj, "serialize") else []
-                for obj in self.get_queryset().all()
+                for obj in self.all()
             ]
 
+        def iter_serialized(self):
+            """Lazy version of serialize(), see SerializableMixin.iter_serialized()."""
+            queryset = self.all()
+            if queryset._result_cache is None:
+                queryset = queryset.iterator()
+            return (
+                obj.iter_serialized() if hasattr(obj, "iter_serialized") else []
+                for obj in queryset
+            )
+
     class Meta:
         abstract = True
 
     objects = SerializableManager()
 
-    def _resolve_field(self, model, field):
-        def _resolve_value(data, field):
-            if "accessor" in field:
-                # call the accessor with value as an argument
-                return field["accessor"](getattr(data, field.get("name")))
-            else:
-                # no accessor, return the value
-                return getattr(data, field.get("name"))
-
-        related_types = {item.name: type(item) for item in model._meta.related_objects}
-        if field.get("name") in related_types.keys():
-            value = (
-                getattr(model, field.get("name")).serialize()
-                if hasattr(model, field.get("name"))
-                and hasattr(getattr(model, field.get("name")), "serialize")
-                else None
+    @classmethod
+    def _get_serialization_plan(cls):
+        """
+        Returns the serialize_fields of the model compiled into SerializationSteps.
+
+        The plan is compiled once per model class, so that the fields and relations are not
+        looked up again for every serialized object.
+        """
+        plan = _serialization_plans.get(cls)
+        if plan is None:
+            relation_kinds = {
+                item.name: SerializationStep.ONE_TO_ONE
+                if type(item) == OneToOneRel
+                else SerializationStep.MANY
+                for item in cls._meta.related_objects
+            }
+            plan = tuple(
+                SerializationStep(
+                    name=field["name"],
+                    key=field["name"].upper(),
+                    kind=relation_kinds.get(field["name"], SerializationStep.VALUE),
+                    accessor=field.get("accessor"),
+                )
+                for field in cls.serialize_fields
             )
-            # field is a related object, let's serialize more
-            if related_types[field.get("name")] == OneToOneRel:
-                # do not wrap one-to-one relations into list
-                return value
+            _serialization_plans[cls] = plan
+        return plan
+
+    @classmethod
+    def _get_serialization_select_related(cls):
+        """Returns the forward relations whose values are serialized."""
+        return [
+            step.name
+            for step in cls._get_serialization_plan()
+            if step.kind == SerializationStep.VALUE
+            and cls._meta.get_field(step.name).is_relation
+            and not cls._meta.get_field(step.name).many_to_many
+        ]
+
+    @classmethod
+    def get_serialization_prefetches(cls, prefix=""):
+        """
+        Returns the prefetch_related lookups for the related objects in serialize_fields.
+
+        The lookups are derived recursively from the serialize_fields of the related models,
+        so serializing any number of objects runs a fixed number of queries.
+        """
+        prefetches = []
+        for step in cls._get_serialization_plan():
+            if step.kind == SerializationStep.VALUE:
+                continue
+            lookup = prefix + step.name
+            related_model = cls._meta.get_field(step.name).related_model
+            if not issubclass(related_model, SerializableMixin):
+                prefetches.append(lookup)
+                continue
+
+            queryset = related_model._default_manager.all()
+            select_related = related_model._get_serialization_select_related()
+            if select_related:
+                queryset = queryset.select_related(*select_related)
+            prefetches.append(models.Prefetch(lookup, queryset=queryset))
+            prefetches.extend(
+                related_model.get_serialization_prefetches(prefix=lookup + "__")
+            )
+        return prefetches
+
+    def _serialize_children(self, lazy):
+        for step in self._get_serialization_plan():
+            if step.kind == SerializationStep.VALUE:
+                # concrete field, let's just add the value
+                value = getattr(self, step.name)
+                if step.accessor:
+                    value = step.accessor(value)
+                yield {"key": step.key, "value": value}
+                continue
+
+            # field is a related object, let's serialize more. A missing one-to-one
+            # relation raises an AttributeError subclass, which is treated as no value.
+            related = getattr(self, step.name, None)
+            if not hasattr(related, "serialize"):
+                value = None
+            elif lazy:
+                value = related.iter_serialized()
             else:
-                return {
-                    "key": field.get("name").upper(),
-                    "children": value,
-                }
-        else:
-            # concrete field, let's just add the value
-            return {
-                "key": field.get("name").upper(),
-                "value": _resolve_value(model, field),
-            }
+                value = related.serialize()
+            if step.kind == SerializationStep.MANY:
+                yield {"key": step.key, "children": value}
+            elif value is not None:
+                # do not wrap one-to-one relations into list
+                yield value
 
     def serialize(self):
         return {
             "key": self._meta.model_name.upper(),
-            "children": [
-                self._resolve_field(self, field)
-                for field in self.serialize_fields
-                if self._resolve_field(self, field) is not None
-            ],
+            "children": list(self._serialize_children(lazy=False)),
+        }
+
+    def iter_serialized(self):
+        """
+        Lazy version of serialize(), where the children are generators.
+
+        Related objects are serialized only when the generators are consumed, e.g. by
+        utils.streaming.iter_json, so the whole tree is never held in memory at once.
+        """
+        return {
+            "key": self._meta.model_name.upper(),
+            "children": self._serialize_children(lazy=True),
         }
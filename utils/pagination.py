@@ -0,0 +1,320 @@
+import datetime
+import json
+import operator
+from collections import namedtuple
+from functools import reduce
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet
+from django.utils.translation import ugettext_lazy as _
+from graphene.relay import PageInfo
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from graphql_relay.connection.arrayconnection import cursor_to_offset, offset_to_cursor
+
+from open_city_profile.exceptions import InvalidCursorError
+
+CURSOR_SALT = "utils.pagination.keyset_cursor"
+
+KeysetKey = namedtuple("KeysetKey", ("path", "descending", "nullable"))
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # keep the microseconds, which DjangoJSONEncoder drops
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    """JSON serializer for signing which also accepts e.g. UUID and datetime values."""
+
+    def dumps(self, obj):
+        return json.dumps(obj, cls=CursorJSONEncoder, separators=(",", ":")).encode(
+            "latin-1"
+        )
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+def encode_cursor(ordering, values):
+    """
+    Returns a cursor for the values of the ordering fields and the pk of a row.
+
+    The cursor is signed, so that the ordering fields in it can be trusted when the cursor
+    is given back.
+    """
+    return signing.dumps(
+        {"order": ordering, "values": values},
+        salt=CURSOR_SALT,
+        serializer=CursorSerializer,
+    )
+
+
+def decode_cursor(cursor):
+    """Returns the content of a keyset cursor, or None if the cursor is not one."""
+    if not cursor:
+        return None
+    try:
+        return signing.loads(cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+    except signing.BadSignature:
+        return None
+
+
+def _get_keyset_key(model, item):
+    """
+    Returns the KeysetKey of an order_by() item, or None if the item is not a field.
+
+    Only paths of single-valued relations ending in a concrete field are accepted, so that
+    every row has exactly one value for the key.
+    """
+    if not isinstance(item, str) or item == "?":
+        return None
+    path = item.lstrip("-")
+    field = None
+    nullable = False
+    for name in path.split("__"):
+        if field is not None:
+            if not field.is_relation or field.many_to_many or field.one_to_many:
+                return None
+            model = field.related_model
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        # a row has no value if any relation on the path is nullable, reverse
+        # relations always are
+        nullable = nullable or field.null
+    if field.is_relation:
+        return None
+    return KeysetKey(path, item.startswith("-"), nullable)
+
+
+def get_keyset_keys(model, ordering):
+    """Returns the KeysetKeys of the ordering before the pk, or None if it can't be used."""
+    keys = []
+    for item in ordering:
+        if item in ("pk", model._meta.pk.name):
+            break
+        key = _get_keyset_key(model, item)
+        if key is None:
+            return None
+        keys.append(key)
+    return keys
+
+
+def _get_beyond_filter(name, descending, value, nullable):
+    # PostgreSQL sorts NULL values after the other values in ascending order
+    if descending:
+        if value is None:
+            return Q(**{f"{name}__isnull": False})
+        return Q(**{f"{name}__lt": value})
+    if value is None:
+        return None
+    condition = Q(**{f"{name}__gt": value})
+    return condition | Q(**{f"{name}__isnull": True}) if nullable else condition
+
+
+def get_keyset_filter(names, keys, values, forward=True):
+    """
+    Returns a Q object for the rows after the values in the ordering of the keys, or
+    before them if forward is False. The last of the names and values is the pk.
+    """
+    conditions = []
+    equal = Q()
+    for name, key, value in zip(names, keys, values):
+        descending = key.descending if forward else not key.descending
+        beyond = _get_beyond_filter(name, descending, value, key.nullable)
+        if beyond is not None:
+            conditions.append(equal & beyond)
+        equal &= Q(**{name: value})
+    return reduce(operator.or_, conditions)
+
+
+def get_keyset_ordering(keys):
+    return [("-" if key.descending else "") + key.path for key in keys]
+
+
+def paginate_keyset(connection_type, args, queryset, keys, after, before):
+    """Returns the page of the queryset selected by the connection args as a connection."""
+    ordering = get_keyset_ordering(keys)
+    names = [f"keyset_{index}" for index in range(len(keys))] + ["pk"]
+    keys = keys + [KeysetKey("pk", False, False)]
+    iterable = queryset
+    queryset = queryset.annotate(
+        **{name: F(key.path) for name, key in zip(names, keys[:-1])}
+    )
+    if after:
+        queryset = queryset.filter(get_keyset_filter(names, keys, after["values"]))
+    if before:
+        queryset = queryset.filter(
+            get_keyset_filter(names, keys, before["values"], forward=False)
+        )
+
+    first = args.get("first")
+    last = args.get("last")
+    # With only last given, the page is read from the end in the reversed ordering
+    backward = last is not None and first is None
+    queryset = queryset.order_by(
+        *[
+            ("-" if key.descending != backward else "") + name
+            for name, key in zip(names, keys)
+        ]
+    )
+    limit = last if backward else first
+    nodes = list(queryset if limit is None else queryset[: limit + 1])
+    has_more = limit is not None and len(nodes) > limit
+    nodes = nodes[:limit]
+    has_previous_page = backward and has_more
+    has_next_page = not backward and has_more
+    if backward:
+        nodes.reverse()
+    elif last is not None and len(nodes) > last:
+        nodes = nodes[-last:] if last else []
+        has_previous_page = True
+
+    edges = [
+        connection_type.Edge(
+            node=node,
+            cursor=encode_cursor(ordering, [getattr(node, name) for name in names]),
+        )
+        for node in nodes
+    ]
+    connection = connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
+    connection.iterable = iterable
+    return connection
+
+
+def _get_matching_cursor(args, name, keys):
+    """
+    Returns the keyset cursor of the argument, or None if the argument is not given.
+
+    Raises InvalidCursorError if the cursor is not a valid cursor of the ordering of the
+    keys, since it doesn't point to any row of this ordering.
+    """
+    cursor = decode_cursor(args.get(name))
+    if args.get(name) and not (
+        cursor
+        and cursor["order"] == get_keyset_ordering(keys)
+        and len(cursor["values"]) == len(keys) + 1
+    ):
+        raise InvalidCursorError(_("Invalid cursor."))
+    return cursor
+
+
+def _get_offset(args, name):
+    if not args.get(name):
+        return None
+    offset = cursor_to_offset(args[name])
+    if offset is None:
+        raise InvalidCursorError(_("Invalid cursor."))
+    return offset
+
+
+def paginate_offset(connection_type, args, queryset):
+    """
+    Returns the page of the queryset selected by the connection args as a connection.
+
+    The page is read with offset cursors like graphql_relay's connection_from_list_slice,
+    but one row more than the page is read to find out if there are rows after it, so the
+    rows are counted only when the page is read from the end without a before cursor.
+    """
+    after = _get_offset(args, "after")
+    before = _get_offset(args, "before")
+    first = args.get("first")
+    last = args.get("last")
+
+    lower_bound = after + 1 if after is not None else 0
+    upper_bound = before
+    length = None
+    if upper_bound is None and last is not None and first is None:
+        length = upper_bound = queryset.count()
+
+    end_offset = upper_bound
+    if first is not None:
+        page_end = lower_bound + first
+        end_offset = page_end if end_offset is None else min(end_offset, page_end)
+    if end_offset is None:
+        nodes = list(queryset[lower_bound:])
+        has_more = False
+    else:
+        page_length = max(end_offset - lower_bound, 0)
+        nodes = list(queryset[lower_bound:][: page_length + 1])
+        has_more = len(nodes) > page_length
+        nodes = nodes[:page_length]
+    end_offset = lower_bound + len(nodes)
+    has_next_page = (
+        first is not None and has_more and (before is None or end_offset < before)
+    )
+
+    start_offset = lower_bound
+    if last is not None:
+        start_offset = max(start_offset, end_offset - last)
+        skipped = start_offset - lower_bound
+        nodes = nodes[skipped:]
+
+    edges = [
+        connection_type.Edge(node=node, cursor=offset_to_cursor(start_offset + index))
+        for index, node in enumerate(nodes)
+    ]
+    connection = connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=last is not None and start_offset > lower_bound,
+            has_next_page=has_next_page,
+        ),
+    )
+    connection.iterable = queryset
+    connection.length = length
+    return connection
+
+
+class KeysetFilterConnectionField(DjangoFilterConnectionField):
+    """
+    Filter connection field which pages with keyset cursors instead of offsets
+
+    The cursor of an edge holds the values of the ordering fields and the pk of the node, and
+    the next page is read from the rows after those values. A page is then found with an
+    index regardless of how deep it is, and rows inserted meanwhile don't shift the pages.
+
+    If the queryset is not explicitly ordered, the default ordering of the model is used,
+    and the pk if there is none. The cursors are only valid for the ordering they were
+    created in, so the ordering must be repeated when the next pages are read, and a cursor
+    of another ordering is rejected with InvalidCursorError. Querysets which are ordered
+    by something else than fields, e.g. an annotation, are paged with offset cursors by
+    paginate_offset().
+    """
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable):
+        iterable = maybe_queryset(iterable)
+        if isinstance(iterable, QuerySet):
+            ordering = iterable.query.order_by
+            if not ordering and iterable.query.default_ordering:
+                ordering = iterable.model._meta.ordering
+            keys = get_keyset_keys(iterable.model, ordering or ())
+            if keys is not None:
+                return paginate_keyset(
+                    connection,
+                    args,
+                    iterable,
+                    keys,
+                    _get_matching_cursor(args, "after", keys),
+                    _get_matching_cursor(args, "before", keys),
+                )
+            return paginate_offset(connection, args, iterable)
+        return super().resolve_connection(connection, args, iterable)
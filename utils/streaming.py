@@ -0,0 +1,77 @@
+import json
+import logging
+from collections.abc import Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Ends a streamed JSON response which failed after its status was sent. Content cut short
+# is never valid JSON, and the marker tells the reader why.
+STREAM_ERROR_MARKER = "\n/* ERROR: the response is incomplete */\n"
+
+
+class JSONObject:
+    """Iterable of (key, value) pairs, which iter_json encodes lazily as a JSON object."""
+
+    def __init__(self, items):
+        self._items = items
+
+    def items(self):
+        return self._items
+
+
+def _iter_json_parts(value, encoder):
+    if isinstance(value, (dict, JSONObject)):
+        yield "{"
+        for index, (key, item) in enumerate(value.items()):
+            yield "{}{}: ".format(", " if index else "", json.dumps(str(key)))
+            yield from _iter_json_parts(item, encoder)
+        yield "}"
+    elif isinstance(value, (list, tuple, Iterator)):
+        yield "["
+        for index, item in enumerate(value):
+            if index:
+                yield ", "
+            yield from _iter_json_parts(item, encoder)
+        yield "]"
+    else:
+        yield encoder.encode(value)
+
+
+def iter_json(value, buffer_size=8192):
+    """
+    Yield the value encoded as JSON in parts of about buffer_size characters.
+
+    Iterators and generators in the value are encoded as lists and JSONObjects as objects,
+    both consumed lazily, so large trees can be streamed e.g. with a StreamingHttpResponse. The output is the same
+    as json.dumps with DjangoJSONEncoder.
+    """
+    encoder = DjangoJSONEncoder()
+    buffer = []
+    buffered_size = 0
+    for part in _iter_json_parts(value, encoder):
+        buffer.append(part)
+        buffered_size += len(part)
+        if buffered_size >= buffer_size:
+            yield "".join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_json_response(value, buffer_size=8192):
+    """
+    Yield the iter_json parts of the value for the content of a StreamingHttpResponse.
+
+    The status of the response has been sent by the time the parts are consumed, so an error
+    can't be reported with it anymore. Instead, the error is logged and the content is ended
+    with STREAM_ERROR_MARKER. Anything that can fail early should be evaluated before the
+    response is created.
+    """
+    try:
+        yield from iter_json(value, buffer_size)
+    except Exception:
+        logger.exception("Streaming a JSON response failed")
+        yield STREAM_ERROR_MARKER
@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from profiles.models import Profile
+from profiles.tests.factories import (
+    AddressFactory,
+    EmailFactory,
+    PhoneFactory,
+    ProfileFactory,
+    SensitiveDataFactory,
+)
+from services.enums import ServiceType
+from services.tests.factories import ServiceConnectionFactory, ServiceFactory
+from subscriptions.tests.factories import SubscriptionFactory
+from utils.models import SerializationStep
+
+
+def test_serialization_plan_is_compiled_once_per_model():
+    plan = Profile._get_serialization_plan()
+
+    assert Profile._get_serialization_plan() is plan
+    assert [(step.key, step.kind) for step in plan[5:8]] == [
+        ("SENSITIVEDATA", SerializationStep.ONE_TO_ONE),
+        ("EMAILS", SerializationStep.MANY),
+        ("PHONES", SerializationStep.MANY),
+    ]
+
+
+def test_serialize_leaves_out_missing_one_to_one_relations():
+    profile = ProfileFactory()
+    assert "SENSITIVEDATA" not in [
+        child["key"] for child in profile.serialize()["children"]
+    ]
+
+    SensitiveDataFactory(profile=profile, ssn="010190-001A")
+    profile = Profile.objects.get(pk=profile.pk)
+    assert {"key": "SSN", "value": "010190-001A"} in next(
+        child
+        for child in profile.serialize()["children"]
+        if child["key"] == "SENSITIVEDATA"
+    )["children"]
+
+
+def test_serialize_runs_a_fixed_number_of_queries_with_for_serialization():
+    def count_serialization_queries(profile):
+        with CaptureQueriesContext(connection) as context:
+            Profile.objects.for_serialization().get(pk=profile.pk).serialize()
+        return len(context.captured_queries)
+
+    empty_profile = ProfileFactory()
+    profile = ProfileFactory()
+    SensitiveDataFactory(profile=profile)
+    for service_type in ServiceType:
+        EmailFactory(profile=profile)
+        PhoneFactory(profile=profile)
+        AddressFactory(profile=profile)
+        SubscriptionFactory(profile=profile)
+        ServiceConnectionFactory(
+            profile=profile, service=ServiceFactory(service_type=service_type)
+        )
+
+    assert count_serialization_queries(profile) == count_serialization_queries(
+        empty_profile
+    )
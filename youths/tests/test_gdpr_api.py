@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from django.urls import reverse
 
@@ -26,7 +28,7 @@ def test_get_profile_information_from_gdpr_api(api_client, youth_profile, snapsh
     )
 
     assert response.status_code == 200
-    snapshot.assert_match(response.json())
+    snapshot.assert_match(json.loads(b"".join(response.streaming_content)))
 
 
 @pytest.mark.parametrize("true_value", TRUE_VALUES)
@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.db import DatabaseError, transaction
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers, status
 from rest_framework.exceptions import APIException
@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from utils.models import SerializableMixin
+from utils.streaming import iter_json_response
 from youths.models import YouthProfile
 
 
@@ -37,8 +38,10 @@ class YouthProfileGDPRAPIView(APIView):
             return HttpResponse(status=404)
         return super().dispatch(request, *args, **kwargs)
 
-    def get_object(self) -> SerializableMixin:
-        return get_object_or_404(self.model, profile__pk=self.kwargs["pk"])
+    def get_object(self, queryset=None) -> SerializableMixin:
+        if queryset is None:
+            queryset = self.model.objects.all()
+        return get_object_or_404(queryset, profile__pk=self.kwargs["pk"])
 
     def check_dry_run(self):
         """Check if parameters provided to the view indicate it's being used for dry_run."""
@@ -52,7 +55,11 @@ class YouthProfileGDPRAPIView(APIView):
 
     def get(self, request, *args, **kwargs):
         """Retrieve all profile data related to the given id."""
-        return Response(self.get_object().serialize(), status=status.HTTP_200_OK)
+        youth_profile = self.get_object(self.model.objects.for_serialization())
+        return StreamingHttpResponse(
+            iter_json_response(youth_profile.iter_serialized()),
+            content_type="application/json",
+        )
 
     def delete(self, request, *args, **kwargs):
         """Delete all data related to the given profile.